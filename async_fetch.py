@@ -0,0 +1,110 @@
+"""
+Concurrent download of all the external data sources.
+
+The notebooks download the CSSE series, the worldometers pages, the UN M49
+page and the ISO 3166 list one after the other with blocking calls. Here they
+are requested concurrently with aiohttp, through one connection pool, with a
+timeout and retries with exponential backoff on connection errors and 5xx
+responses. The parsing (pd.read_csv, pd.read_html) runs on a thread pool, so
+that it does not block the event loop while the other downloads proceed. The
+refresh then takes about as long as the slowest source:
+
+    tables = fetch(SOURCES)
+    df_cases = tables["confirmed"]
+
+A source is a (url, parse) pair, parse turning the text of the response into
+a DataFrame, so that any local HTTP server can stand in for the real sites.
+"""
+
+import asyncio
+import functools
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import pandas as pd
+
+from csse_store import CONFIRMED_URL, DEATHS_URL
+
+
+def parse_csv(text, **read_csv_kwargs):
+    return pd.read_csv(io.StringIO(text), **read_csv_kwargs)
+
+
+def parse_html(text, table=0, **read_html_kwargs):
+    df = pd.read_html(io.StringIO(text), **read_html_kwargs)[table]
+    if "#" in df.columns:
+        df = df.drop(columns="#")
+    return df
+
+
+SOURCES = {
+    "confirmed": (CONFIRMED_URL, parse_csv),
+    "deaths": (DEATHS_URL, parse_csv),
+    "population": ("https://www.worldometers.info/world-population/population-by-country/", parse_html),
+    "countries": ("https://www.worldometers.info/geography/countries-of-the-world/", parse_html),
+    "m49": ("https://unstats.un.org/unsd/methodology/m49/overview/", parse_html),
+    # keep_default_na: "NA" is the code of Namibia
+    "iso": (
+        "https://raw.githubusercontent.com/lukes/ISO-3166-Countries-with-Regional-Codes/master/all/all.csv",
+        functools.partial(parse_csv, keep_default_na=False, na_values=[""]),
+    ),
+}
+
+
+async def _download(session, url, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    response.raise_for_status()
+                    return await response.text()
+                error = aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status, message=response.reason
+                )
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+    raise error
+
+
+async def fetch_all(sources, timeout=60.0, retries=3, backoff=0.5, limit=10, executor=None):
+    """Download and parse {name: (url, parse)} concurrently, returning {name: DataFrame}"""
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    executor = ThreadPoolExecutor() if own_executor else executor
+
+    async def one(session, url, parse):
+        text = await _download(session, url, retries, backoff)
+        return await loop.run_in_executor(executor, parse, text)
+
+    try:
+        connector = aiohttp.TCPConnector(limit=limit)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            results = await asyncio.gather(*(one(session, url, parse) for url, parse in sources.values()))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+    return dict(zip(sources, results))
+
+
+def fetch(sources=SOURCES, **kwargs):
+    """Blocking version of fetch_all, for scripts and notebooks"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch_all(sources, **kwargs))
+    # inside a running event loop (Jupyter), run the downloads on a loop of their own in a thread
+    with ThreadPoolExecutor(1) as thread:
+        return thread.submit(asyncio.run, fetch_all(sources, **kwargs)).result()
+
+
+def main():
+    tables = fetch()
+    for name, df in tables.items():
+        print(f"{name:10s} {df.shape}")
+
+
+if __name__ == "__main__":
+    main()
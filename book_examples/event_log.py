@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Compact columnar storage for the events of the stochastic simulations
+(programs 6.3 to 6.6).
+
+Instead of Python lists of floats in which every state is written twice to
+draw step plots, an EventLog keeps three typed columns
+
+    t       float64   time of the event
+    X       int32     state after the event, one column per compartment
+    event   uint8     index of the reaction which fired
+
+that is 9 + 4 * n_species bytes per event. Events are buffered in a
+preallocated chunk; full chunks are kept in memory or, when a directory is
+given, appended to raw binary files which are read back as memory maps. Step
+plots and resamples on a regular grid are built on demand from the columns.
+
+The append method has the signature of the on_event hook of ssa_engine, so a
+log can be filled directly by next_reaction(..., on_event=log.append).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from ssa_engine import next_reaction, sir_demography
+
+COLUMNS = ("t", "X", "event")
+
+
+class EventLog:
+    def __init__(self, n_species, path=None, chunk_size=65536):
+        self.n_species = n_species
+        self.path = path
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._n_flushed = 0
+        self._new_buffer()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "log.json"), "w") as f:
+                json.dump({"n_species": n_species}, f)
+            for name in COLUMNS:
+                open(os.path.join(path, name + ".bin"), "wb").close()
+
+    def _new_buffer(self):
+        self._t = np.empty(self.chunk_size, dtype=np.float64)
+        self._X = np.empty((self.chunk_size, self.n_species), dtype=np.int32)
+        self._event = np.empty(self.chunk_size, dtype=np.uint8)
+        self._n = 0
+
+    def append(self, t, event, X):
+        """Record one event"""
+        n = self._n
+        self._t[n] = t
+        self._X[n] = X
+        self._event[n] = event
+        self._n = n + 1
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def extend(self, t, event, X):
+        """Record a block of events"""
+        start = 0
+        while start < len(t):
+            room = min(len(t) - start, self.chunk_size - self._n)
+            self._t[self._n : self._n + room] = t[start : start + room]
+            self._X[self._n : self._n + room] = X[start : start + room]
+            self._event[self._n : self._n + room] = event[start : start + room]
+            self._n += room
+            start += room
+            if self._n == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Move the buffered events to the chunk list or to disk"""
+        if self._n == 0:
+            return
+        columns = (self._t[: self._n], self._X[: self._n], self._event[: self._n])
+        if self.path is None:
+            self._chunks.append(tuple(c.copy() for c in columns))
+        else:
+            for name, column in zip(COLUMNS, columns):
+                with open(os.path.join(self.path, name + ".bin"), "ab") as f:
+                    f.write(column.tobytes())
+        self._n_flushed += self._n
+        self._n = 0
+
+    def __len__(self):
+        return self._n_flushed + self._n
+
+    @classmethod
+    def open(cls, path):
+        """Reopen a log written to disk"""
+        with open(os.path.join(path, "log.json")) as f:
+            meta = json.load(f)
+        log = cls.__new__(cls)
+        log.n_species = meta["n_species"]
+        log.path = path
+        log.chunk_size = 65536
+        log._chunks = []
+        log._n_flushed = os.path.getsize(os.path.join(path, "t.bin")) // 8
+        log._new_buffer()
+        return log
+
+    def columns(self):
+        """Return the (t, event, X) columns, memory mapped for a log on disk"""
+        self.flush()
+        if self.path is not None:
+            n = self._n_flushed
+            if n == 0:
+                return np.empty(0), np.empty(0, dtype=np.uint8), np.empty((0, self.n_species), dtype=np.int32)
+            t = np.memmap(os.path.join(self.path, "t.bin"), dtype=np.float64, mode="r", shape=(n,))
+            X = np.memmap(os.path.join(self.path, "X.bin"), dtype=np.int32, mode="r", shape=(n, self.n_species))
+            event = np.memmap(os.path.join(self.path, "event.bin"), dtype=np.uint8, mode="r", shape=(n,))
+            return t, event, X
+        if len(self._chunks) > 1:
+            self._chunks = [tuple(np.concatenate(c) for c in zip(*self._chunks))]
+        if not self._chunks:
+            return np.empty(0), np.empty(0, dtype=np.uint8), np.empty((0, self.n_species), dtype=np.int32)
+        t, X, event = self._chunks[0]
+        return t, event, X
+
+    def step(self, X0, t0=0.0):
+        """Times and states with every state duplicated, for step plots"""
+        t, event, X = self.columns()
+        T = np.repeat(np.concatenate(([t0], t)), 2)[1:]
+        S = np.repeat(np.concatenate((np.reshape(X0, (1, -1)), X)), 2, axis=0)[:-1]
+        return T, S
+
+    def resample(self, grid, X0):
+        """State at every time of the grid, X0 being the state before the first event"""
+        t, event, X = self.columns()
+        k = np.searchsorted(t, grid, side="right") - 1
+        RES = np.empty((len(grid), self.n_species), dtype=np.int32)
+        RES[k < 0] = X0
+        RES[k >= 0] = X[k[k >= 0]]
+        return RES
+
+
+def main():
+    beta = 1.0
+    gamma = 1 / 10.0
+    mu = 5e-4
+    N0 = 5000.0
+    ND = 2 * 365.0
+    Y0 = np.ceil(mu * N0 / gamma)
+    X0 = np.floor(gamma * N0 / beta)
+    Z0 = N0 - X0 - Y0
+    log = EventLog(3)
+    next_reaction(*sir_demography(beta, gamma, mu), (X0, Y0, Z0), [ND], seed=1, on_event=log.append)
+    t, event, X = log.columns()
+    print(f"{len(log)} events, {t.nbytes + event.nbytes + X.nbytes} bytes")
+    print(log.resample(np.arange(0.0, ND, 365.0), (X0, Y0, Z0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Monte Carlo statistics of fade-outs and imports for the model of program 6.6.
+
+Every replicate is simulated in a worker process with its own random stream
+(spawned from one SeedSequence, so that the whole experiment is reproducible)
+and the event-driven SSA of ssa_engine. Instead of keeping the trajectory, the
+worker follows the events as they happen and sends back a small summary
+record:
+
+    - the number of epsilon and delta imports;
+    - the number of fade-outs (the infection dying out);
+    - the number of introductions (imports occurring during a fade-out) and
+      how many of them sparked an outbreak, that is brought the number of
+      infected up to outbreak_size before dying out again;
+    - histograms, on fixed bins, of the fade-out durations and of the
+      intervals between the starts of successive outbreaks.
+
+The parent aggregates these records as they arrive, by value of N0, so that
+the memory used does not depend on the number of replicates.
+"""
+
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from ssa_engine import next_reaction, sir_imports
+
+EPSILON_IMPORT = 6
+DELTA_IMPORT = 7
+
+
+def _summary_record(N0, beta, gamma, mu, delta, epsilon, ND, outbreak_size, bins, seed):
+    Y0 = np.ceil(mu * N0 / gamma)
+    X0 = np.floor(gamma * N0 / beta)
+    Z0 = N0 - X0 - Y0
+    record = {
+        "N0": N0,
+        "epsilon_imports": 0,
+        "delta_imports": 0,
+        "fadeouts": 0,
+        "introductions": 0,
+        "sparks": 0,
+    }
+    fadeouts = []
+    intervals = []
+    state = {"fade_start": None, "pending": False, "last_outbreak": None}
+
+    def on_event(t, m, X):
+        if m == EPSILON_IMPORT:
+            record["epsilon_imports"] += 1
+        elif m == DELTA_IMPORT:
+            record["delta_imports"] += 1
+        if X[1] == 0:
+            if state["fade_start"] is None:
+                record["fadeouts"] += 1
+                state["fade_start"] = t
+                state["pending"] = False
+        elif state["fade_start"] is not None:
+            # the first import after a fade-out
+            record["introductions"] += 1
+            fadeouts.append(t - state["fade_start"])
+            state["fade_start"] = None
+            state["pending"] = True
+        elif state["pending"] and X[1] >= outbreak_size:
+            record["sparks"] += 1
+            # an interval needs a previous outbreak, not the start of the run
+            if state["last_outbreak"] is not None:
+                intervals.append(t - state["last_outbreak"])
+            state["last_outbreak"] = t
+            state["pending"] = False
+
+    propensities, Change, Depends = sir_imports(beta, gamma, mu, epsilon, delta)
+    next_reaction(propensities, Change, Depends, (X0, Y0, Z0), [ND], seed=seed, on_event=on_event)
+    record["fadeout_histogram"] = np.histogram(fadeouts, bins=bins)[0]
+    record["interval_histogram"] = np.histogram(intervals, bins=bins)[0]
+    record["fadeout_time"] = float(np.sum(fadeouts))
+    return record
+
+
+_BINS = None
+
+
+def _init_worker(bins):
+    # the histogram bins are sent once per process rather than with every task
+    global _BINS
+    _BINS = bins
+
+
+def _worker(task):
+    *args, seed = task
+    return _summary_record(*args, _BINS, seed)
+
+
+def aggregate(totals, record):
+    """Add a summary record to the running totals of its value of N0"""
+    N0 = record["N0"]
+    if N0 not in totals:
+        totals[N0] = {key: np.zeros_like(value) if isinstance(value, np.ndarray) else 0 for key, value in record.items()}
+        totals[N0]["N0"] = N0
+        totals[N0]["runs"] = 0
+    total = totals[N0]
+    total["runs"] += 1
+    for key, value in record.items():
+        if key != "N0":
+            total[key] = total[key] + value
+    return totals
+
+
+def run(
+    N0_grid,
+    n_runs,
+    beta=1.0,
+    gamma=1 / 10.0,
+    mu=5e-4,
+    delta=0.01,
+    epsilon_factor=10.0,
+    ND=10 * 365.0,
+    outbreak_size=10,
+    bins=None,
+    seed=None,
+    processes=None,
+    batch_size=None,
+):
+    """Run n_runs replicates for every N0 of the grid over a pool of processes.
+
+    epsilon is set, as in program 6.6, to delta * epsilon_factor / N0.
+    Returns a dictionary of aggregated summaries indexed by N0. The tasks are
+    submitted batch_size at a time, so that the memory used does not grow with
+    n_runs.
+    """
+    if bins is None:
+        bins = np.linspace(0.0, ND, 51)
+    # the k-th stream is the k-th child that SeedSequence(seed).spawn would
+    # give, created only when its task is submitted
+    entropy = np.random.SeedSequence(seed).entropy
+    tasks = (
+        (
+            float(N0), beta, gamma, mu, delta, delta * epsilon_factor / N0, ND, outbreak_size,
+            np.random.SeedSequence(entropy, spawn_key=(k * n_runs + i,)),
+        )
+        for k, N0 in enumerate(N0_grid)
+        for i in range(n_runs)
+    )
+    if batch_size is None:
+        batch_size = 64 * (processes or os.cpu_count() or 1)
+    totals = {}
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(bins,)) as pool:
+        # imap_unordered consumes its whole iterable at once, hence the batches
+        while True:
+            batch = list(itertools.islice(tasks, batch_size))
+            if not batch:
+                break
+            for record in pool.imap_unordered(_worker, batch, chunksize=4):
+                aggregate(totals, record)
+    for total in totals.values():
+        imports = total["introductions"]
+        total["spark_share"] = total["sparks"] / imports if imports else np.nan
+        total["fadeout_frequency"] = total["fadeouts"] / (total["runs"] * ND / 365.0)
+    return totals
+
+
+def main():
+    totals = run([500, 1000, 5000], 40, seed=1)
+    for N0, total in sorted(totals.items()):
+        print(
+            f"N0 = {N0:g}: {total['fadeout_frequency']:.2f} fade-outs per year, "
+            f"{total['spark_share']:.2f} of the introductions sparked an outbreak"
+        )
+
+
+if __name__ == "__main__":
+    main()
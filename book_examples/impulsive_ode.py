@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Integration of ODE models with state jumps at scheduled times: pulse
+vaccination (program 8.3), one-off campaigns, yearly aging of school cohorts...
+
+The schedule is a list of (time, jump) pairs, jump(V, t) returning the state
+right after the event. The driver integrates the model with odeint from one
+event to the next and writes the solution directly at the requested output
+times in a preallocated array; at an output time coinciding with an event the
+state recorded is the one after the jump, as in program 8.3.
+"""
+
+import numpy as np
+import scipy.integrate as spi
+
+
+def integrate(diff_eqs, INPUT, t_range, schedule, args=(), **odeint_kwargs):
+    """Integrate diff_eqs over t_range, applying the jumps of the schedule.
+
+    Returns RES with shape (len(t_range), len(INPUT)).
+    """
+    t_range = np.asarray(t_range, dtype=float)
+    V = np.array(INPUT, dtype=float)
+    RES = np.empty((len(t_range), len(V)))
+    schedule = sorted(schedule, key=lambda event: event[0])
+    t0, t_end = t_range[0], t_range[-1]
+    k = 0
+    while k < len(schedule) and schedule[k][0] <= t0:
+        V = schedule[k][1](V, t0)
+        k += 1
+    RES[0] = V
+    t = t0
+    i = 1
+    while i < len(t_range):
+        # next event, or the end of the output grid
+        t_next = schedule[k][0] if k < len(schedule) and schedule[k][0] <= t_end else t_end
+        j = np.searchsorted(t_range, t_next, side="right")
+        t_seg = t_range[i:j]
+        if len(t_seg) == 0 or t_seg[-1] != t_next:
+            t_seg = np.append(t_seg, t_next)
+        if t_next > t:
+            PRES = spi.odeint(diff_eqs, V, np.concatenate(([t], t_seg)), args=args, **odeint_kwargs)
+            V = PRES[-1]
+            RES[i:j] = PRES[1 : 1 + j - i]
+        t = t_next
+        jumped = False
+        while k < len(schedule) and schedule[k][0] == t_next:
+            V = schedule[k][1](V, t_next)
+            k += 1
+            jumped = True
+        if jumped and j > i and t_range[j - 1] == t_next:
+            RES[j - 1] = V
+        i = j
+    return RES
+
+
+def periodic(start, period, stop):
+    """Times of events repeated every period from start, until stop excluded"""
+    return np.arange(start, stop, period)
+
+
+def pulse_vaccination(p, S=0, R=2):
+    """Jump vaccinating a proportion p of the susceptibles (moved to R)"""
+
+    def jump(V, t):
+        V = V.copy()
+        V[R] += V[S] * p
+        V[S] *= 1 - p
+        return V
+
+    return jump
+
+
+def pulse_schedule(p, T, tV, ND, S=0, R=2):
+    """Schedule of program 8.3: a pulse every T days from tV on"""
+    jump = pulse_vaccination(p, S, R)
+    return [(t, jump) for t in periodic(tV, T, ND)]
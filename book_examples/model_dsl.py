@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""
+Declarative specification of compartmental models.
+
+Programs 2.1 to 2.7 each hand-write a diff_eqs function allocating a new
+array on every call. Here a model is declared once by its compartments, its
+parameters and its transitions, a transition being a (source, target, rate)
+triple in which source or target is None for births and deaths and rate is an
+expression of the compartments, the parameters and t:
+
+    SIR = Model(
+        ["S", "I", "R"],
+        ["beta", "gamma"],
+        [("S", "I", "beta * S * I"), ("I", "R", "gamma * I")],
+    )
+
+From this single source the model provides
+    - rhs(params): a right-hand side for odeint writing into a preallocated
+      buffer (or into out=, which also accepts one column per realisation);
+    - jacobian(params): the analytic Jacobian, differentiated with sympy,
+      for the Dfun argument of odeint;
+    - stoichiometry, depends and propensities(params): the Change and
+      Depends matrices and the propensity functions of ssa_engine;
+    - vector_propensity(params): the propensities of many replicates at once,
+      for tau_leaping.
+"""
+
+import numpy as np
+import scipy.integrate as spi
+import sympy
+from sympy.printing.numpy import NumPyPrinter
+
+
+def _bind(code, name, namespace):
+    """Define the function of a compiled code object in namespace"""
+    exec(code, namespace)
+    return namespace[name]
+
+
+class Model:
+    def __init__(self, compartments, parameters, transitions):
+        self.compartments = list(compartments)
+        self.parameters = list(parameters)
+        self.transitions = list(transitions)
+        self._symbols = {name: sympy.Symbol(name) for name in self.compartments + self.parameters + ["t"]}
+        self.rates = [sympy.sympify(rate, locals=self._symbols) for _, _, rate in self.transitions]
+        unknown = set().union(*(rate.free_symbols for rate in self.rates)) - set(self._symbols.values())
+        if unknown:
+            raise ValueError(f"Unknown symbols in the rates: {sorted(map(str, unknown))}")
+
+        index = {name: i for i, name in enumerate(self.compartments)}
+        self.stoichiometry = np.zeros((len(self.transitions), len(self.compartments)), dtype=int)
+        for j, (source, target, _) in enumerate(self.transitions):
+            if source is not None:
+                self.stoichiometry[j, index[source]] -= 1
+            if target is not None:
+                self.stoichiometry[j, index[target]] += 1
+        X = [self._symbols[name] for name in self.compartments]
+        self.depends = np.array([[x in rate.free_symbols for x in X] for rate in self.rates], dtype=bool)
+        self.equations = [
+            sum((int(c) * rate for c, rate in zip(self.stoichiometry[:, i], self.rates) if c), sympy.Integer(0))
+            for i in range(len(X))
+        ]
+        self.jacobian_matrix = sympy.Matrix(self.equations).jacobian(X)
+        # code objects generated once per model, only the namespace changes with the parameters
+        self._code = {}
+
+    def _compiled(self, name, make_source):
+        if name not in self._code:
+            self._code[name] = compile(make_source(), f"<model_dsl {name}>", "exec")
+        return self._code[name]
+
+    def _namespace(self, params):
+        missing = set(self.parameters) - set(params)
+        if missing:
+            raise ValueError(f"Missing parameters: {sorted(missing)}")
+        namespace = {name: params[name] for name in self.parameters}
+        namespace["numpy"] = np
+        return namespace
+
+    def _unpack(self, column=False):
+        if column:
+            return "".join(f"    {name} = INP[:, {i}]\n" for i, name in enumerate(self.compartments))
+        return "".join(f"    {name} = INP[{i}]\n" for i, name in enumerate(self.compartments))
+
+    def _assignments(self, targets, expressions):
+        printer = NumPyPrinter()
+        common, reduced = sympy.cse(expressions, symbols=sympy.numbered_symbols("_x"))
+        lines = [f"    {symbol} = {printer.doprint(expr)}\n" for symbol, expr in common]
+        lines += [f"    {target} = {printer.doprint(expr)}\n" for target, expr in zip(targets, reduced)]
+        return "".join(lines)
+
+    def rhs(self, params):
+        """diff_eqs(INP, t, out=None) for odeint"""
+        namespace = self._namespace(params)
+        namespace["_Y"] = np.zeros(len(self.compartments))
+
+        def source():
+            targets = [f"out[{i}]" for i in range(len(self.compartments))]
+            return (
+                "def diff_eqs(INP, t, out=None):\n"
+                "    if out is None:\n"
+                "        out = _Y\n"
+                + self._unpack()
+                + self._assignments(targets, self.equations)
+                + "    return out\n"
+            )
+
+        return _bind(self._compiled("diff_eqs", source), "diff_eqs", namespace)
+
+    def jacobian(self, params):
+        """Dfun(INP, t) for odeint, only the structural non-zeros are written"""
+        namespace = self._namespace(params)
+        n = len(self.compartments)
+        namespace["_J"] = np.zeros((n, n))
+
+        def source():
+            entries = [(i, k) for i in range(n) for k in range(n) if self.jacobian_matrix[i, k] != 0]
+            targets = [f"_J[{i}, {k}]" for i, k in entries]
+            expressions = [self.jacobian_matrix[i, k] for i, k in entries]
+            body = self._unpack() + self._assignments(targets, expressions)
+            return "def jacobian(INP, t):\n" + body + "    return _J\n"
+
+        return _bind(self._compiled("jacobian", source), "jacobian", namespace)
+
+    def propensities(self, params):
+        """One scalar rate function per transition, for ssa_engine"""
+        namespace = self._namespace(params)
+        functions = []
+        for j, rate in enumerate(self.rates):
+
+            def source(j=j, rate=rate):
+                header = f"def rate_{j}(INP, t=0.0):\n"
+                return header + self._unpack() + self._assignments(["_a"], [rate]) + "    return _a\n"
+
+            functions.append(_bind(self._compiled(f"rate_{j}", source), f"rate_{j}", dict(namespace)))
+        return functions
+
+    def vector_propensity(self, params):
+        """propensity(X) for states of shape (n, n_compartments), for tau_leaping"""
+        namespace = self._namespace(params)
+
+        def source():
+            targets = [f"out[:, {j}]" for j in range(len(self.rates))]
+            return (
+                "def propensity(INP, t=0.0):\n"
+                f"    out = numpy.empty((INP.shape[0], {len(self.rates)}))\n"
+                + self._unpack(column=True)
+                + self._assignments(targets, self.rates)
+                + "    return out\n"
+            )
+
+        return _bind(self._compiled("propensity", source), "propensity", namespace)
+
+
+# Models of chapter 2
+
+SIR = Model(["S", "I", "R"], ["beta", "gamma"], [("S", "I", "beta * S * I"), ("I", "R", "gamma * I")])
+
+SIR_DEMOGRAPHY = Model(
+    ["S", "I", "R"],
+    ["beta", "gamma", "mu"],
+    [
+        (None, "S", "mu"),
+        ("S", "I", "beta * S * I"),
+        ("I", "R", "gamma * I"),
+        ("S", None, "mu * S"),
+        ("I", None, "mu * I"),
+        ("R", None, "mu * R"),
+    ],
+)
+
+SIR_MORTALITY = Model(
+    ["X", "Y", "Z"],
+    ["beta", "gamma", "mu", "rho"],
+    [
+        (None, "X", "mu"),
+        ("X", "Y", "beta * X * Y"),
+        ("Y", "Z", "gamma * Y"),
+        ("Y", None, "(gamma + mu) * Y / (1 - rho) - gamma * Y"),
+        ("X", None, "mu * X"),
+        ("Z", None, "mu * Z"),
+    ],
+)
+
+SIS = Model(["S", "I"], ["beta", "gamma"], [("S", "I", "beta * S * I"), ("I", "S", "gamma * I")])
+
+SEIR = Model(
+    ["S", "E", "I"],
+    ["beta", "sigma", "gamma", "mu"],
+    [
+        (None, "S", "mu"),
+        ("S", "E", "beta * S * I"),
+        ("E", "I", "sigma * E"),
+        ("I", None, "gamma * I"),
+        ("S", None, "mu * S"),
+        ("E", None, "mu * E"),
+        ("I", None, "mu * I"),
+    ],
+)
+
+SICR = Model(
+    ["S", "I", "C"],
+    ["beta", "epsilon", "gamma", "Gamma", "mu", "q"],
+    [
+        (None, "S", "mu"),
+        ("S", "I", "beta * S * (I + epsilon * C)"),
+        ("I", "C", "q * gamma * I"),
+        ("I", None, "(1 - q) * gamma * I"),
+        ("C", None, "Gamma * C"),
+        ("S", None, "mu * S"),
+        ("I", None, "mu * I"),
+        ("C", None, "mu * C"),
+    ],
+)
+
+
+def main():
+    params = {"beta": 520 / 365.0, "gamma": 1 / 7.0, "mu": 1 / (70 * 365.0)}
+    t_range = np.arange(0.0, 60 * 365 + 1.0)
+    RES = spi.odeint(SIR_DEMOGRAPHY.rhs(params), (0.1, 1e-4, 1 - 0.1 - 1e-4), t_range, Dfun=SIR_DEMOGRAPHY.jacobian(params))
+    print(RES[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -52,8 +52,8 @@ def diff_eqs(INP, t):
     return Y  # For odeint
 
 
-T = np.zeros((np.ceil(ND / Step), 1))
-RES = np.zeros((np.ceil(ND / Step), 2))
+T = np.zeros((int(np.ceil(ND / Step)), 1))
+RES = np.zeros((int(np.ceil(ND / Step)), 2))
 INPUT = INPUT0
 t = 0
 loop = 0
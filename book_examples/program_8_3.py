@@ -17,10 +17,11 @@
 ### ilias.soumpasis@gmail.com	  #
 ###################################
 
-import scipy.integrate as spi
 import numpy as np
 import pylab as pl
 
+import impulsive_ode
+
 beta = 520 / 365.0
 gamma = 1 / 7.0
 mu = 1 / (70 * 365.0)
@@ -47,35 +48,14 @@ def diff_eqs(INP, t):
 
 
 t_start = 0.0
-t_end = tV
-t_inc = TS
-t_range1 = np.arange(t_start, t_end + t_inc, t_inc)
-t_start = tV
-t_end = ND + TS
+t_end = ND
 t_inc = TS
-t_range2 = np.arange(tV, t_end, t_inc)
-TT = np.hstack((t_range1, t_range2))
-RES1 = spi.odeint(diff_eqs, INPUT, t_range1)
-i = 0
-INPUT = RES1[-1]
-RES2 = np.zeros((3))
-while t_range2[i] < ND:
-    INPUT[2] = INPUT[2] + INPUT[0] * p
-    INPUT[0] = INPUT[0] * (1 - p)
-    t_range3 = np.arange(t_range2[i], t_range2[i + T], t_inc)
-    tc2 = spi.odeint(diff_eqs, INPUT, t_range3)
-    INPUT = tc2[-1]
-    RES2 = np.vstack((RES2, tc2))
-    i += T
-print len(TT)
-RES2 = RES2[
-    1:,
-]
-S = np.hstack((RES1[:, 0], RES2[:, 0]))
-I = np.hstack((RES1[:, 1], RES2[:, 1]))
-R = np.hstack((RES1[:, 2], RES2[:, 2]))
-TT = np.arange(len(S))
-print len(S)
+TT = np.arange(t_start, t_end + t_inc, t_inc)
+RES = impulsive_ode.integrate(diff_eqs, INPUT, TT, impulsive_ode.pulse_schedule(p, T, tV, ND))
+print(RES)
+S = RES[:, 0]
+I = RES[:, 1]
+R = RES[:, 2]
 
 pl.subplot(311)
 pl.plot(TT / 365.0, S, "-g")
@@ -18,10 +18,11 @@
 ### ilias.soumpasis@gmail.com	  #
 ###################################
 
-import scipy.integrate as spi
 import numpy as np
 import pylab as pl
 
+import multigroup_vaccination
+
 beta = np.array([[1.0, 0.01], [0.01, 0.1]])
 gamma = np.array([0.1, 0.1])
 mu = np.array([0.2, 0.8]) * 5e-5
@@ -32,39 +33,17 @@ I0 = np.array([1e-5, 1e-5])
 ND = MaxTime = 100 * 365
 TS = 1.0
 
-INPUT = np.hstack((S0, I0))
-
-
-def diff_eqs(INP, t):
-    """The main set of equations"""
-    Y = np.zeros((4))
-    V = INP
-    MU = sum(mu)
-    for i in range(2):
-        Y[i] = mu[i] * (1 - p[i]) - (beta[i, 0] * V[2] + beta[i, 1] * V[3]) * V[i] - MU * V[i]
-        Y[i + 2] = (beta[i, 0] * V[2] + beta[i, 1] * V[3]) * V[i] - gamma[i] * V[i + 2] - MU * V[i + 2]
-    return Y  # For odeint
-
-
 t_start = 0.0
-t_end = tV
-t_inc = TS
-t_range1 = np.arange(t_start, t_end, t_inc)
-t_start = tV
 t_end = ND
 t_inc = TS
-t_range2 = np.arange(tV, t_end, t_inc)
-T = np.hstack((t_range1, t_range2))
-p = np.array([0, 0])
-RES1 = spi.odeint(diff_eqs, INPUT, t_range1)
-p = p0
-RES2 = spi.odeint(diff_eqs, RES1[-1], t_range2)
-print RES2
+T = np.arange(t_start, t_end, t_inc)
+RES = multigroup_vaccination.integrate(beta, gamma, mu, [(tV, p0)], S0, I0, T)
+print(RES)
 
-S1 = np.hstack((RES1[:, 0], RES2[:, 0]))
-S2 = np.hstack((RES1[:, 1], RES2[:, 1]))
-I1 = np.hstack((RES1[:, 2], RES2[:, 2]))
-I2 = np.hstack((RES1[:, 3], RES2[:, 3]))
+S1 = RES[:, 0]
+S2 = RES[:, 1]
+I1 = RES[:, 2]
+I2 = RES[:, 3]
 
 TT = np.arange(len(S1))
 
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Persistent content-addressed cache of simulation results.
+
+A result is stored under the SHA-256 hash of everything that determines it:
+the model identity (module, name and source code of the function, so that
+editing the equations invalidates the entries, and the values of the globals
+and closure variables it reads), the parameters, the initial conditions, the
+time grid and the solver options. Trajectories are written as
+compressed .npz files in one directory whose total size is capped; when the
+cap is exceeded the least recently used files are removed, a cache hit
+refreshing the modification time of its file.
+
+The book programs keep their parameters in module globals, which odeint does
+not see. The globals read by the function are part of its identity, so that
+reassigning one (as program 8.1 does with p) gives a new key, but passing the
+parameters as params= keeps the key explicit. Arrays and pandas objects are
+hashed by content; a value without a stable encoding (an arbitrary object,
+whose repr may be truncated or hold its address) is an error rather than a
+key that silently goes stale:
+
+    cache = ResultCache("~/.cache/covid19_models")
+    RES = cache.odeint(diff_eqs, INPUT, t_range, params={"beta": beta, "gamma": gamma})
+"""
+
+import hashlib
+import inspect
+import os
+import tempfile
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import scipy.integrate as spi
+
+# types whose repr is a complete and stable encoding of the value
+_SCALARS = (type(None), bool, int, complex, str, bytes)
+
+
+def _feed(h, obj):
+    """Update the hash h with a canonical encoding of obj"""
+    if isinstance(obj, dict):
+        h.update(b"{")
+        for key in sorted(obj, key=str):
+            _feed(h, str(key))
+            _feed(h, obj[key])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"(")
+        for item in obj:
+            _feed(h, item)
+        h.update(b")")
+    elif isinstance(obj, (set, frozenset)):
+        _feed(h, sorted(obj, key=repr))
+    elif isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        # the repr of pandas objects is truncated: hash the content
+        h.update(f"p{type(obj).__name__}{obj.shape}".encode())
+        h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+        if not isinstance(obj, pd.Index):
+            _feed(h, obj.index)
+            _feed(h, [str(dtype) for dtype in np.atleast_1d(obj.dtypes)])
+        if isinstance(obj, pd.DataFrame):
+            _feed(h, obj.columns)
+    elif isinstance(obj, np.ndarray) or isinstance(obj, np.generic):
+        array = np.ascontiguousarray(obj)
+        h.update(f"a{array.dtype.str}{array.shape}".encode())
+        h.update(array.tobytes())
+    elif isinstance(obj, float):
+        h.update(b"f" + repr(obj).encode())
+    elif isinstance(obj, type):
+        h.update(f"t{obj.__module__}.{obj.__qualname__}".encode())
+    elif callable(obj):
+        h.update(model_identity(obj).encode())
+    elif isinstance(obj, _SCALARS):
+        h.update(f"{type(obj).__name__}:{obj!r}".encode())
+    else:
+        # a default repr holds the memory address, and others may be truncated
+        raise TypeError(
+            f"Cannot hash a value of type {type(obj).__name__} into a cache key, pass it through params= "
+            "as arrays, numbers or strings"
+        )
+
+
+def _code_names(code):
+    """Global names read by a code object and the functions nested in it"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _free_values(func, seen):
+    """Values of the globals and closure variables read by func, functions by their identity"""
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return None
+    namespace = getattr(func, "__globals__", {})
+    # modules are not state, and _names are buffers (e.g. the output arrays of model_dsl)
+    values = {
+        name: namespace[name]
+        for name in sorted(_code_names(code))
+        if name in namespace and not name.startswith("_") and not isinstance(namespace[name], types.ModuleType)
+    }
+    closure = []
+    for cell in func.__closure__ or ():
+        try:
+            closure.append(cell.cell_contents)
+        except ValueError:  # empty cell
+            closure.append(None)
+    free = {"globals": values, "closure": closure}
+
+    def resolve(value):
+        if isinstance(value, dict):
+            return {key: resolve(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [resolve(item) for item in value]
+        if callable(value) and not isinstance(value, type):
+            return _identity(value, seen)
+        return value
+
+    return resolve(free)
+
+
+def _identity(func, seen):
+    name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    if id(func) in seen:
+        return name
+    seen = seen | {id(func)}
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        # generated code (model_dsl): hash the bytecode instead
+        code = getattr(func, "__code__", None)
+        source = code.co_code.hex() if code is not None else ""
+    h = hashlib.sha256(source.encode())
+    try:
+        _feed(h, _free_values(func, seen))
+    except TypeError as error:
+        raise TypeError(f"{name} reads a global or closure value that cannot be hashed: {error}") from None
+    return f"{name}:{h.hexdigest()[:16]}"
+
+
+def model_identity(func):
+    """Module, qualified name and hash of the source code and of the globals and closure values of a function"""
+    return _identity(func, frozenset())
+
+
+def make_key(model, params=None, initial=None, t=None, solver=None):
+    """Hash of a model configuration"""
+    h = hashlib.sha256()
+    _feed(h, model_identity(model) if callable(model) else str(model))
+    for part in (params, initial, t, solver):
+        _feed(h, np.asarray(part) if isinstance(part, (list, tuple)) and np.ndim(part) else part)
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """Dictionary of the arrays stored under key, or None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, **arrays):
+        """Store arrays under key, then evict down to the size cap"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+
+    def odeint(self, func, y0, t, args=(), params=None, **kwargs):
+        """spi.odeint with its result cached"""
+        key = make_key(func, {"args": args, "params": params}, y0, t, kwargs)
+        result = self.get(key)
+        if result is None:
+            RES = spi.odeint(func, y0, t, args=args, **kwargs)
+            self.put(key, RES=RES)
+            return RES
+        return result["RES"]
+
+
+def main():
+    beta = 0.3
+    gamma = 1 / 15
+    sigma = 1 / 7
+
+    def deriv(y, t, N, beta, gamma, sigma):
+        S, E, I, R = y
+        return -beta * S * I / N, beta * S * I / N - sigma * E, sigma * E - gamma * I, gamma * I
+
+    cache = ResultCache(os.path.join(tempfile.gettempdir(), "covid19_result_cache"))
+    t = np.linspace(0, 100 * 365, 36500)
+    for _ in range(2):
+        start = time.perf_counter()
+        RES = cache.odeint(deriv, (9999, 1, 0, 0), t, args=(10000, beta, gamma, sigma))
+        print(f"{time.perf_counter() - start:.4f} s, final state {RES[-1]}")
+
+
+if __name__ == "__main__":
+    main()
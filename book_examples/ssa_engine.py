@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Reusable exact stochastic simulation core for the event-driven models of
+programs 6.4 and 6.6.
+
+The model is declared once as
+    - a stoichiometry matrix, Change[j, i] being the change of species i when
+      reaction j fires;
+    - a list of propensity functions, Rate[j] = propensities[j](X);
+    - a reactant matrix, Depends[j, i] being True when the propensity of
+      reaction j depends on species i.
+From these a reaction dependency graph is precomputed and the system is run
+with the Gibson-Bruck next reaction method: every reaction keeps an absolute
+putative firing time in an indexed priority queue, and after an event only the
+propensities which depend on the species it changed are recomputed, their
+firing times being rescaled instead of redrawn.
+
+The state is sampled at fixed times into a preallocated array, so the memory
+used does not depend on the number of events.
+"""
+
+import numpy as np
+
+
+def dependency_graph(Change, Depends):
+    """For every reaction j, the reactions whose propensity is affected by j"""
+    Change = np.asarray(Change)
+    Depends = np.asarray(Depends, dtype=bool)
+    affected = (Change != 0).astype(int) @ Depends.T.astype(int) > 0
+    graph = []
+    for j in range(len(Change)):
+        # the reaction which fired always needs a new firing time
+        graph.append(sorted(set(np.flatnonzero(affected[j]).tolist()) | {j}))
+    return graph
+
+
+class _Exponentials:
+    """Unit exponential variates drawn from numpy in blocks"""
+
+    def __init__(self, rng, block=8192):
+        self.rng = rng
+        self.block = block
+        self.values = []
+
+    def draw(self):
+        if not self.values:
+            self.values = self.rng.standard_exponential(self.block).tolist()
+        return self.values.pop()
+
+
+def _sift_up(heap, pos, tau, k):
+    j = heap[k]
+    while k > 0:
+        parent = (k - 1) >> 1
+        p = heap[parent]
+        if tau[p] <= tau[j]:
+            break
+        heap[k] = p
+        pos[p] = k
+        k = parent
+    heap[k] = j
+    pos[j] = k
+
+
+def _sift_down(heap, pos, tau, k):
+    n = len(heap)
+    j = heap[k]
+    while True:
+        child = 2 * k + 1
+        if child >= n:
+            break
+        if child + 1 < n and tau[heap[child + 1]] < tau[heap[child]]:
+            child += 1
+        c = heap[child]
+        if tau[j] <= tau[c]:
+            break
+        heap[k] = c
+        pos[c] = k
+        k = child
+    heap[k] = j
+    pos[j] = k
+
+
+def _update(heap, pos, tau, j):
+    k = pos[j]
+    if k > 0 and tau[j] < tau[heap[(k - 1) >> 1]]:
+        _sift_up(heap, pos, tau, k)
+    else:
+        _sift_down(heap, pos, tau, k)
+
+
+def next_reaction(propensities, Change, Depends, X0, sample_times, seed=None, on_event=None):
+    """Simulate the system with the next reaction method.
+
+    If given, on_event(t, m, X) is called after every event with the time,
+    the index of the reaction which fired and the updated state.
+
+    Returns (RES, counts) where RES[k] is the state at sample_times[k] and
+    counts[j] is the number of times reaction j fired.
+    """
+    rng = np.random.default_rng(seed)
+    exponentials = _Exponentials(rng)
+    sample_times = np.asarray(sample_times, dtype=float)
+    Change = np.asarray(Change)
+    n_reactions, n_species = Change.shape
+    changes = [[(i, int(Change[j, i])) for i in range(n_species) if Change[j, i]] for j in range(n_reactions)]
+    graph = dependency_graph(Change, Depends)
+
+    X = [float(x) for x in X0]
+    RES = np.empty((len(sample_times), n_species))
+    counts = np.zeros(n_reactions, dtype=np.int64)
+    t = 0.0
+    Rate = [f(X) for f in propensities]
+    tau = [t + exponentials.draw() / a if a > 0 else np.inf for a in Rate]
+    heap = sorted(range(n_reactions), key=tau.__getitem__)
+    pos = [0] * n_reactions
+    for k, j in enumerate(heap):
+        pos[j] = k
+
+    s = 0
+    n_samples = len(sample_times)
+    while s < n_samples:
+        m = heap[0]
+        t_next = tau[m]
+        while s < n_samples and sample_times[s] < t_next:
+            RES[s] = X
+            s += 1
+        if s == n_samples or t_next == np.inf:
+            RES[s:] = X
+            break
+        t = t_next
+        for i, c in changes[m]:
+            X[i] += c
+        counts[m] += 1
+        if on_event is not None:
+            on_event(t, m, X)
+        for j in graph[m]:
+            a_old = Rate[j]
+            a_new = Rate[j] = propensities[j](X)
+            if a_new <= 0:
+                tau[j] = np.inf
+            elif j != m and a_old > 0 and tau[j] != np.inf:
+                tau[j] = t + (a_old / a_new) * (tau[j] - t)
+            else:
+                tau[j] = t + exponentials.draw() / a_new
+            _update(heap, pos, tau, j)
+    return RES, counts
+
+
+def sir_demography(beta, gamma, mu):
+    """Reactions of program 6.4: SIR with births and deaths"""
+    Change = np.array(
+        [
+            [-1, +1, 0],  # infection
+            [0, -1, +1],  # recovery
+            [+1, 0, 0],  # birth
+            [-1, 0, 0],  # death of susceptible
+            [0, -1, 0],  # death of infected
+            [0, 0, -1],  # death of recovered
+        ]
+    )
+    propensities = [
+        lambda V: beta * V[0] * V[1] / (V[0] + V[1] + V[2]),
+        lambda V: gamma * V[1],
+        lambda V: mu * (V[0] + V[1] + V[2]),
+        lambda V: mu * V[0],
+        lambda V: mu * V[1],
+        lambda V: mu * V[2],
+    ]
+    Depends = np.array(
+        [
+            [1, 1, 1],
+            [0, 1, 0],
+            [1, 1, 1],
+            [1, 0, 0],
+            [0, 1, 0],
+            [0, 0, 1],
+        ],
+        dtype=bool,
+    )
+    return propensities, Change, Depends
+
+
+def sir_imports(beta, gamma, mu, epsilon, delta):
+    """Reactions of program 6.6: SIR with births, deaths and two forms of imports"""
+    propensities, Change, Depends = sir_demography(beta, gamma, mu)
+    propensities = propensities + [
+        lambda V: epsilon * V[0],
+        lambda V: delta,
+    ]
+    Change = np.vstack((Change, [[-1, +1, 0], [0, +1, 0]]))
+    Depends = np.vstack((Depends, [[1, 0, 0], [0, 0, 0]]))
+    return propensities, Change, Depends
+
+
+def main():
+    beta = 1.0
+    gamma = 1 / 10.0
+    mu = 5e-4
+    N0 = 1e6
+    ND = 2 * 365.0
+    Y0 = np.ceil(mu * N0 / gamma)
+    X0 = np.floor(gamma * N0 / beta)
+    Z0 = N0 - X0 - Y0
+    T = np.arange(0.0, ND, 1.0)
+    RES, counts = next_reaction(*sir_demography(beta, gamma, mu), (X0, Y0, Z0), T, seed=1)
+    print(f"{counts.sum()} events")
+    print(RES[-1])
+
+
+if __name__ == "__main__":
+    main()
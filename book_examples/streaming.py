@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Generators running the models block by block, for long-horizon runs.
+
+Instead of returning one RES array at the end of the run (or growing it with
+np.vstack), these generators yield (T, RES) blocks, one simulated year at a
+time by default, keeping only the current block in memory. Consumers such as
+live plots, online statistics or TrajectoryStore.append can then process the
+results while a multi-decade simulation is still running:
+
+    for T, RES in stream_odeint(diff_eqs, INPUT, t_range):
+        store.append(T, RES)
+
+The blocks partition t_range: concatenating them gives the same output as a
+single run.
+"""
+
+import numpy as np
+import scipy.integrate as spi
+
+import impulsive_ode
+from ssa_engine import next_reaction
+from tau_leaping import tau_leap
+
+
+def _blocks(t_range, block_length):
+    """Index ranges of t_range covering block_length units of time each"""
+    t_range = np.asarray(t_range, dtype=float)
+    edges = np.arange(t_range[0] + block_length, t_range[-1], block_length)
+    cuts = np.concatenate(([0], np.searchsorted(t_range, edges, side="right"), [len(t_range)]))
+    return [(lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:]) if hi > lo]
+
+
+def stream_odeint(diff_eqs, INPUT, t_range, block_length=365.0, schedule=(), args=(), **odeint_kwargs):
+    """Yield the solution of an ODE model block by block, with optional jumps"""
+    t_range = np.asarray(t_range, dtype=float)
+    V = np.asarray(INPUT, dtype=float)
+    t = t_range[0]
+    for lo, hi in _blocks(t_range, block_length):
+        T = t_range[lo:hi]
+        # integrate from the end of the previous block, which is not repeated
+        t_seg = np.concatenate(([t], T)) if T[0] > t else T
+        if schedule:
+            events = [event for event in schedule if t < event[0] <= T[-1] or (lo == 0 and event[0] <= t)]
+            PRES = impulsive_ode.integrate(diff_eqs, V, t_seg, events, args=args, **odeint_kwargs)
+        else:
+            PRES = spi.odeint(diff_eqs, V, t_seg, args=args, **odeint_kwargs)
+        RES = PRES[len(t_seg) - len(T) :]
+        V = RES[-1]
+        t = T[-1]
+        yield T, RES
+
+
+def stream_ssa(propensities, Change, Depends, X0, sample_times, block_length=365.0, seed=None):
+    """Yield the samples of an event-driven simulation block by block"""
+    sample_times = np.asarray(sample_times, dtype=float)
+    blocks = _blocks(sample_times, block_length)
+    streams = np.random.SeedSequence(seed).spawn(len(blocks))
+    X = np.asarray(X0, dtype=float)
+    t = 0.0
+    for (lo, hi), stream in zip(blocks, streams):
+        T = sample_times[lo:hi]
+        # the chain is Markov: restart from the last sample, with the time shifted
+        RES, _ = next_reaction(propensities, Change, Depends, X, T - t, seed=stream)
+        X = RES[-1]
+        t = T[-1]
+        yield T, RES
+
+
+def stream_tau_leap(propensity, Change, X0, sample_times, n_replicates=1, block_length=365.0, seed=None, **kwargs):
+    """Yield the samples of tau-leaping replicates block by block"""
+    sample_times = np.asarray(sample_times, dtype=float)
+    blocks = _blocks(sample_times, block_length)
+    streams = np.random.SeedSequence(seed).spawn(len(blocks))
+    X = X0
+    t = 0.0
+    for (lo, hi), stream in zip(blocks, streams):
+        T = sample_times[lo:hi]
+        RES = tau_leap(propensity, Change, X, T - t, n_replicates, stream, **kwargs)
+        X = RES[-1]
+        t = T[-1]
+        yield T, RES
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+Adaptive tau-leaping for the SIR model with demography of program 6.5.
+
+Program 6.5 leaps with a fixed tau = 1.0 and clamps the Poisson samples which
+would make a compartment negative, which biases the dynamics. Here the leap
+size is selected with the Cao-Gillespie-Petzold (2006) rule, so that the
+expected relative change of every reactant stays below epsilon:
+
+    - reactions which could exhaust one of their reactants within n_critical
+      firings are critical; at most one critical reaction fires per leap,
+      drawn exactly as in the SSA;
+    - when the admissible leap is shorter than a few exact steps, the
+      replicate takes an exact SSA step instead;
+    - a leap which still produces a negative population is rejected and
+      retried with half the step.
+
+Propensities are evaluated for all the replicates at once and the Poisson
+increments of every reaction and replicate are drawn with a single call.
+"""
+
+import numpy as np
+
+
+def _record(RES, X, t, s, sample_times, index):
+    """Store the state of the replicates which reached their next sample time"""
+    n_samples = len(sample_times)
+    due = np.flatnonzero(sample_times[np.minimum(s[index], n_samples - 1)] <= t[index])
+    due = due[s[index[due]] < n_samples]
+    while len(due):
+        k = index[due]
+        RES[s[k], k] = X[k]
+        s[k] += 1
+        due = due[(s[k] < n_samples)]
+        due = due[sample_times[s[index[due]]] <= t[index[due]]]
+
+
+def tau_leap(
+    propensity,
+    Change,
+    X0,
+    sample_times,
+    n_replicates=1,
+    seed=None,
+    epsilon=0.03,
+    n_critical=10,
+    order=None,
+    ssa_threshold=10.0,
+):
+    """Simulate n_replicates realisations with adaptive tau-leaping.
+
+    propensity(X) receives the states of several replicates, shape
+    (n, n_species), and returns the rates, shape (n, n_reactions). order[i]
+    is the highest order of the reactions consuming species i (the g_i of Cao
+    et al.), 1 by default.
+
+    X0 is either one state, shared by all the replicates, or one state per
+    replicate, shape (n_replicates, n_species).
+
+    Returns RES with shape (len(sample_times), n_replicates, n_species).
+    """
+    rng = np.random.default_rng(seed)
+    nu = np.asarray(Change, dtype=float)
+    n_species = nu.shape[1]
+    g = np.ones(n_species) if order is None else np.asarray(order, dtype=float)
+    consumed = -np.where(nu < 0, nu, 0.0)
+    reactant_species = consumed.any(axis=0)
+    sample_times = np.asarray(sample_times, dtype=float)
+    n_samples = len(sample_times)
+
+    X = np.broadcast_to(np.asarray(X0, dtype=float), (n_replicates, n_species)).copy()
+    t = np.zeros(n_replicates)
+    s = np.zeros(n_replicates, dtype=int)
+    RES = np.empty((n_samples, n_replicates, n_species))
+    index = np.arange(n_replicates)
+    _record(RES, X, t, s, sample_times, index)
+    index = index[s < n_samples]
+
+    while len(index):
+        Xa = X[index]
+        cap = sample_times[s[index]] - t[index]
+        a = np.maximum(propensity(Xa), 0.0)
+        a0 = a.sum(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            L = np.where(consumed > 0, np.floor(Xa[:, np.newaxis, :] / consumed), np.inf).min(axis=2)
+            critical = (a > 0) & (L < n_critical)
+            anc = np.where(critical, 0.0, a)
+            mean = anc @ nu
+            var = anc @ nu ** 2
+            bound = np.maximum(epsilon * Xa / g, 1.0)
+            tau1 = np.minimum(bound / np.abs(mean), bound ** 2 / var)
+            tau1 = np.where(reactant_species, tau1, np.inf).min(axis=1)
+            exact = tau1 < ssa_threshold / a0
+
+        tau = np.empty(len(index))
+        K = np.zeros(a.shape)
+
+        # exact SSA steps
+        e = np.flatnonzero(exact & (a0 > 0))
+        if len(e):
+            dt = rng.standard_exponential(len(e)) / a0[e]
+            fire = dt < cap[e]
+            tau[e] = np.minimum(dt, cap[e])
+            cum = np.cumsum(a[e], axis=1)
+            m = (cum < rng.random((len(e), 1)) * a0[e, np.newaxis]).sum(axis=1)
+            K[e[fire], m[fire]] = 1.0
+
+        # nothing left to happen, jump to the end
+        z = np.flatnonzero(a0 == 0)
+        tau[z] = sample_times[-1] - t[index[z]]
+
+        # leaps, halved until no population goes negative
+        leap = np.flatnonzero(~exact & (a0 > 0))
+        while len(leap):
+            ac = np.where(critical[leap], a[leap], 0.0)
+            ac0 = ac.sum(axis=1)
+            with np.errstate(divide="ignore"):
+                tau2 = rng.standard_exponential(len(leap)) / ac0
+            step = np.minimum(np.minimum(tau1[leap], tau2), cap[leap])
+            Kl = rng.poisson(anc[leap] * step[:, np.newaxis]).astype(float)
+            c = np.flatnonzero(tau2 <= step)
+            if len(c):
+                m = (np.cumsum(ac[c], axis=1) < rng.random((len(c), 1)) * ac0[c, np.newaxis]).sum(axis=1)
+                Kl[c, m] += 1.0
+            bad = np.any(Xa[leap] + Kl @ nu < 0, axis=1)
+            good = leap[~bad]
+            tau[good] = step[~bad]
+            K[good] = Kl[~bad]
+            tau1[leap[bad]] = step[bad] / 2.0
+            leap = leap[bad]
+
+        X[index] = Xa + K @ nu
+        t_new = t[index] + tau
+        t[index] = np.where(tau >= cap, sample_times[s[index]], t_new)
+        t[index[z]] = sample_times[-1]
+        _record(RES, X, t, s, sample_times, index)
+        index = index[s[index] < n_samples]
+    return RES
+
+
+def sir_demography(beta, gamma, mu):
+    """Vectorised propensities and stoichiometry of program 6.5"""
+    Change = np.array(
+        [
+            [-1, +1, 0],
+            [0, -1, +1],
+            [+1, 0, 0],
+            [-1, 0, 0],
+            [0, -1, 0],
+            [0, 0, -1],
+        ]
+    )
+
+    def propensity(V):
+        Rate = np.empty((V.shape[0], 6))
+        N = V.sum(axis=1)
+        Rate[:, 0] = beta * V[:, 0] * V[:, 1] / N
+        Rate[:, 1] = gamma * V[:, 1]
+        Rate[:, 2] = mu * N
+        Rate[:, 3] = mu * V[:, 0]
+        Rate[:, 4] = mu * V[:, 1]
+        Rate[:, 5] = mu * V[:, 2]
+        return Rate
+
+    return propensity, Change
+
+
+def main():
+    beta = 1.0
+    gamma = 1 / 10.0
+    mu = 5e-4
+    N0 = 5000.0
+    ND = 2 * 365.0
+    Y0 = np.ceil(mu * N0 / gamma)
+    X0 = np.floor(gamma * N0 / beta)
+    Z0 = N0 - X0 - Y0
+    T = np.arange(0.0, ND, 1.0)
+    propensity, Change = sir_demography(beta, gamma, mu)
+    RES = tau_leap(propensity, Change, (X0, Y0, Z0), T, n_replicates=1000, seed=1, order=(2, 2, 1))
+    print(f"{np.mean(RES[-1, :, 1] == 0):.3f} of the replicates went extinct")
+    print(RES[-1].mean(axis=0))
+
+
+if __name__ == "__main__":
+    main()
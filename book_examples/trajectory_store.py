@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Chunked, compressed on-disk storage of model trajectories.
+
+The layout follows Zarr: a store is a directory holding a meta.json file and
+one zlib-compressed file per chunk of chunk_length time points and per column
+(the time column "t" and one column per compartment). Rows are buffered and
+written chunk by chunk while the simulation advances, so a run may be larger
+than the memory and can be read while it is still running. Reading a time
+window of a few compartments only decompresses the chunks it overlaps.
+
+    store = TrajectoryStore.create("run", ["S", "I", "R"])
+    odeint_to_store(diff_eqs, INPUT, t_range, store)
+    T, I = store.window(50 * 365, 60 * 365, ["I"])
+"""
+
+import json
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+from streaming import stream_odeint
+
+
+class TrajectoryStore:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.columns = ["t"] + meta["compartments"]
+        self._buffer = np.empty((meta["chunk_length"], len(self.columns)))
+        self._n_buffered = 0
+
+    @classmethod
+    def create(cls, path, compartments, chunk_length=4096, level=3):
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "compartments": list(compartments),
+            "chunk_length": chunk_length,
+            "level": level,
+            "length": 0,
+            # first and last time of every chunk, to locate time windows
+            "bounds": [],
+        }
+        store = cls(path, meta)
+        store._write_meta()
+        return store
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            return cls(path, json.load(f))
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    def _chunk_path(self, column, k):
+        return os.path.join(self.path, f"{column}.{k}")
+
+    def __len__(self):
+        return self.meta["length"] + self._n_buffered
+
+    def append(self, T, RES):
+        """Append rows: times T, shape (n,), and states RES, shape (n, n_compartments)"""
+        T = np.asarray(T, dtype=float)
+        RES = np.asarray(RES, dtype=float).reshape(len(T), -1)
+        L = self.meta["chunk_length"]
+        if self.meta["length"] % L:
+            raise ValueError("The store was closed on a partial chunk and cannot be extended")
+        start = 0
+        while start < len(T):
+            room = min(len(T) - start, L - self._n_buffered)
+            rows = self._buffer[self._n_buffered : self._n_buffered + room]
+            rows[:, 0] = T[start : start + room]
+            rows[:, 1:] = RES[start : start + room]
+            self._n_buffered += room
+            start += room
+            if self._n_buffered == L:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a chunk"""
+        if self._n_buffered == 0:
+            return
+        k = self.meta["length"] // self.meta["chunk_length"]
+        rows = self._buffer[: self._n_buffered]
+        for i, column in enumerate(self.columns):
+            data = np.ascontiguousarray(rows[:, i]).tobytes()
+            with open(self._chunk_path(column, k), "wb") as f:
+                f.write(zlib.compress(data, self.meta["level"]))
+        self.meta["bounds"].append([rows[0, 0], rows[-1, 0]])
+        self.meta["length"] += self._n_buffered
+        self._n_buffered = 0
+        self._write_meta()
+
+    close = flush
+
+    def _read_chunk(self, column, k):
+        with open(self._chunk_path(column, k), "rb") as f:
+            return np.frombuffer(zlib.decompress(f.read()), dtype=np.float64)
+
+    def _column_names(self, compartments):
+        if compartments is None:
+            return self.meta["compartments"]
+        return [self.meta["compartments"][c] if isinstance(c, int) else c for c in compartments]
+
+    def _rows(self, k):
+        """Chunk k as a (time, compartments) pair, the last one possibly still buffered"""
+        if k * self.meta["chunk_length"] < self.meta["length"]:
+            return lambda name: self._read_chunk(name, k)
+        buffered = self._buffer[: self._n_buffered]
+        return lambda name: buffered[:, self.columns.index(name)]
+
+    def read(self, start=0, stop=None, compartments=None):
+        """Rows start:stop of the time column and of the selected compartments"""
+        n = len(self)
+        stop = n if stop is None else min(stop, n)
+        names = self._column_names(compartments)
+        L = self.meta["chunk_length"]
+        T = np.empty(max(stop - start, 0))
+        RES = np.empty((len(T), len(names)))
+        for k in range(start // L, (stop - 1) // L + 1 if stop > start else 0):
+            lo = max(start, k * L)
+            hi = min(stop, (k + 1) * L)
+            chunk = self._rows(k)
+            T[lo - start : hi - start] = chunk("t")[lo - k * L : hi - k * L]
+            for i, name in enumerate(names):
+                RES[lo - start : hi - start, i] = chunk(name)[lo - k * L : hi - k * L]
+        return T, RES
+
+    def window(self, t_start, t_end, compartments=None):
+        """Rows with t_start <= t <= t_end, reading only the overlapping chunks"""
+        bounds = self.meta["bounds"]
+        if self._n_buffered:
+            bounds = bounds + [[self._buffer[0, 0], self._buffer[self._n_buffered - 1, 0]]]
+        bounds = np.array(bounds).reshape(-1, 2)
+        chunks = np.flatnonzero((bounds[:, 1] >= t_start) & (bounds[:, 0] <= t_end))
+        if len(chunks) == 0:
+            return np.empty(0), np.empty((0, len(self._column_names(compartments))))
+        L = self.meta["chunk_length"]
+        T, RES = self.read(chunks[0] * L, (chunks[-1] + 1) * L, compartments)
+        keep = (T >= t_start) & (T <= t_end)
+        return T[keep], RES[keep]
+
+
+def odeint_to_store(diff_eqs, INPUT, t_range, store, block_length=365.0, args=(), **odeint_kwargs):
+    """Integrate block by block, appending each block to the store"""
+    for T, RES in stream_odeint(diff_eqs, INPUT, t_range, block_length, args=args, **odeint_kwargs):
+        store.append(T, RES)
+    store.flush()
+    return store
+
+
+def main():
+    beta = 520 / 365.0
+    gamma = 1 / 7.0
+    mu = 1 / (70 * 365.0)
+
+    def diff_eqs(V, t):
+        return (
+            mu - beta * V[0] * V[1] - mu * V[0],
+            beta * V[0] * V[1] - gamma * V[1] - mu * V[1],
+            gamma * V[1] - mu * V[2],
+        )
+
+    path = os.path.join(tempfile.mkdtemp(), "program_2_2")
+    store = TrajectoryStore.create(path, ["S", "I", "R"])
+    odeint_to_store(diff_eqs, (0.1, 1e-4, 1 - 0.1 - 1e-4), np.arange(0.0, 100 * 365 + 1.0), store)
+    T, I = TrajectoryStore.open(path).window(50 * 365, 51 * 365, ["I"])
+    print(len(store), T[0], T[-1], I.max())
+
+
+if __name__ == "__main__":
+    main()
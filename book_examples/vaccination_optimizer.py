@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Search of the cheapest vaccination strategy of programs 8.1, 8.2 and 8.3.
+
+Three strategy families are available, each controlled by one value:
+
+    "coverage"  proportion p of newborns vaccinated (program 8.1)
+    "rate"      rate v at which susceptibles are vaccinated (program 8.2)
+    "pulse"     interval T between pulses vaccinating a proportion p of the
+                susceptibles (program 8.3)
+
+A candidate is evaluated by integrating the SIR model with demography up to
+ND, vaccination starting at tV, for one of the objectives
+
+    "infections"        cumulative proportion infected between tV and ND
+    "elimination_time"  time after tV from which the prevalence stays below
+                        the elimination threshold (np.inf if it never does)
+
+and it is acceptable when the objective does not exceed the target. The
+cheapest acceptable value (smallest p or v, largest T) is found by a parallel
+k-section search over a bracket which, for the elimination objective, is first
+reduced with the analytic critical values: p_c = 1 - 1/R0,
+v_c = mu * (R0 - 1) and the longest pulse interval for which the average
+proportion of susceptibles stays below 1/R0. Every solve is cached under a
+hash of the family, value and parameters.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.integrate as spi
+from scipy.optimize import brentq
+
+import impulsive_ode
+
+DEFAULTS = {
+    "beta": 520 / 365.0,
+    "gamma": 1 / 7.0,
+    "mu": 1 / (70 * 365.0),
+    "S0": 0.1,
+    "I0": 1e-4,
+    "tV": 30 * 365,
+    "ND": 100 * 365,
+    "p": 0.1,  # proportion vaccinated at every pulse
+    "threshold": 1e-7,
+}
+
+FAMILIES = ("coverage", "rate", "pulse")
+OBJECTIVES = ("infections", "elimination_time")
+
+_CACHE = {}
+
+
+def diff_eqs(INP, t, beta, gamma, mu, p, v):
+    """SIR with demography, newborn vaccination p and susceptible vaccination v"""
+    Y = np.empty(4)
+    V = INP
+    infection = beta * V[0] * V[1]
+    Y[0] = mu * (1 - p) - infection - mu * V[0] - v * V[0]
+    Y[1] = infection - gamma * V[1] - mu * V[1]
+    Y[2] = mu * p + v * V[0] + gamma * V[1] - mu * V[2]
+    Y[3] = infection  # cumulative infections
+    return Y
+
+
+def basic_reproductive_ratio(params):
+    return params["beta"] / (params["gamma"] + params["mu"])
+
+
+def _pulse_mean_susceptible(T, p, mu):
+    # average of the disease-free periodic solution under pulse vaccination
+    e = np.exp(-mu * T)
+    return 1 - p * (1 - e) / (mu * T * (1 - (1 - p) * e))
+
+
+def critical_value(family, params=None):
+    """Analytic threshold of the family beyond which elimination is possible"""
+    params = dict(DEFAULTS, **(params or {}))
+    R0 = basic_reproductive_ratio(params)
+    mu = params["mu"]
+    if family == "coverage":
+        return 1 - 1 / R0
+    if family == "rate":
+        return mu * (R0 - 1)
+    if family == "pulse":
+        f = lambda T: _pulse_mean_susceptible(T, params["p"], mu) - 1 / R0
+        if f(1e-6) > 0:
+            return 0.0
+        hi = 1.0
+        while f(hi) < 0:
+            hi *= 2
+        return brentq(f, 1e-6, hi)
+    raise ValueError(f"Unknown strategy family {family!r}")
+
+
+def _key(family, value, params):
+    # NumPy scalars are not JSON serializable, and 365 and 365.0 are the same parameter
+    text = json.dumps([family, float(value), sorted((name, float(v)) for name, v in params.items())])
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def simulate(family, value, params):
+    """Integrate the model for one strategy, returning both objectives"""
+    beta, gamma, mu = params["beta"], params["gamma"], params["mu"]
+    S0, I0, tV, ND = params["S0"], params["I0"], params["tV"], params["ND"]
+    INPUT = np.array((S0, I0, 1 - S0 - I0, 0.0))
+    t_range1 = np.arange(0.0, tV + 1.0)
+    t_range2 = np.arange(tV, ND + 1.0)
+    RES1 = spi.odeint(diff_eqs, INPUT, t_range1, args=(beta, gamma, mu, 0.0, 0.0))
+    if family == "coverage":
+        RES2 = spi.odeint(diff_eqs, RES1[-1], t_range2, args=(beta, gamma, mu, value, 0.0))
+    elif family == "rate":
+        RES2 = spi.odeint(diff_eqs, RES1[-1], t_range2, args=(beta, gamma, mu, 0.0, value))
+    else:
+        schedule = impulsive_ode.pulse_schedule(params["p"], value, tV, ND)
+        RES2 = impulsive_ode.integrate(diff_eqs, RES1[-1], t_range2, schedule, args=(beta, gamma, mu, 0.0, 0.0))
+    # elimination: the prevalence stays below the threshold until ND
+    above = np.flatnonzero(RES2[:, 1] >= params["threshold"])
+    if len(above) == 0:
+        elimination_time = 0.0
+    elif above[-1] == len(t_range2) - 1:
+        elimination_time = np.inf
+    else:
+        elimination_time = t_range2[above[-1] + 1] - tV
+    return {"infections": RES2[-1, 3] - RES2[0, 3], "elimination_time": elimination_time}
+
+
+def _evaluate(task):
+    return simulate(*task)
+
+
+def evaluate(family, values, params=None, cache=_CACHE, processes=None):
+    """Evaluate several values of a family in parallel, reusing cached solves"""
+    params = dict(DEFAULTS, **(params or {}))
+    keys = [_key(family, value, params) for value in values]
+    missing = [(key, value) for key, value in zip(keys, values) if key not in cache]
+    if len(missing) > 1 and processes != 1:
+        with ProcessPoolExecutor(processes) as pool:
+            results = pool.map(_evaluate, [(family, value, params) for _, value in missing])
+            for (key, _), result in zip(missing, results):
+                cache[key] = result
+    else:
+        for key, value in missing:
+            cache[key] = simulate(family, value, params)
+    return [cache[key] for key in keys]
+
+
+def optimize(family, objective, target, params=None, bounds=None, tol=None, n_candidates=8, cache=_CACHE, processes=None):
+    """Cheapest value of the family for which the objective is at most target.
+
+    Returns None when even the most expensive value of the bracket fails.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown strategy family {family!r}")
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}")
+    params = dict(DEFAULTS, **(params or {}))
+    if bounds is None:
+        bounds = {"coverage": (0.0, 1.0), "rate": (0.0, 0.1), "pulse": (1.0, 20 * 365.0)}[family]
+    lo, hi = bounds
+    if objective == "elimination_time":
+        critical = critical_value(family, params)
+        if family == "pulse":
+            hi = min(hi, critical)
+        else:
+            lo = max(lo, critical)
+        if lo > hi:
+            return None
+    if tol is None:
+        tol = 1e-3 * (hi - lo)
+    # the strategy gets cheaper from `best` towards `cheap`
+    best, cheap = (lo, hi) if family == "pulse" else (hi, lo)
+
+    def accepted(results):
+        return [result[objective] <= target for result in results]
+
+    ok_best, ok_cheap = accepted(evaluate(family, [best, cheap], params, cache, processes))
+    if not ok_best:
+        return None
+    if ok_cheap:
+        return cheap
+    while abs(cheap - best) > tol:
+        candidates = np.linspace(best, cheap, n_candidates + 2)[1:-1]
+        ok = accepted(evaluate(family, candidates, params, cache, processes))
+        k = ok.index(False) if False in ok else len(ok)
+        if k > 0:
+            best = candidates[k - 1]
+        if k < len(ok):
+            cheap = candidates[k]
+    return best
+
+
+def main():
+    for family in FAMILIES:
+        print(f"{family}: critical value {critical_value(family):.4g}")
+        value = optimize(family, "elimination_time", 20 * 365.0)
+        print(f"{family}: cheapest value eliminating within 20 years {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Resolution of country names to ISO 3166 alpha-2 codes.
+
+The CSSE series, the worldometers tables and the ISO code lists spell some
+countries differently ("Korea, South", "South Korea"; "Czechia", "Czech
+Republic (Czechia)"; "Taiwan*", ...). Instead of an exact-match lookup per
+country patched with a hand-maintained conversion dict, every dataset is
+given an alpha-2 column by the resolver and the datasets are joined on it:
+
+    resolver = CountryResolver()
+    df = resolver.join(df_cases_summary, df_population, left_on="country", right_on="Country")
+
+The index maps normalized names (lower case, without accents, punctuation or
+"&") to codes and is built once from country_name_to_iso_code.csv and the
+aliases. Names which miss the index are matched with difflib against the
+known names; the decision, match or miss, is cached so that each distinct
+name is resolved once.
+"""
+
+import difflib
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+ISO_CODE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "country_name_to_iso_code.csv")
+
+# names which are missing from, or wrong in, country_name_to_iso_code.csv
+ALIASES = {
+    # worldometers "Congo" is the Republic of the Congo, CSSE "Congo (Brazzaville)"
+    "Congo": "CG",
+    "Czech Republic": "CZ",
+    "Macedonia": "MK",
+    "Swaziland": "SZ",
+    "Cape Verde": "CV",
+    "Vatican City": "VA",
+    "Palestine": "PS",
+    "United States of America": "US",
+    "UK": "GB",
+    "St. Vincent & Grenadines": "VC",
+    "Taiwan, Province of China": "TW",
+}
+
+# populations missing from the worldometers table (CIA world factbook)
+POPULATION_FALLBACK = {"XK": 1932774, "TW": 23603049, "EH": 652271}
+
+
+def normalize(name):
+    """Lower case name without accents, punctuation and articles, '&' spelled 'and'"""
+    name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    name = name.lower().replace("&", " and ").replace("st.", "saint")
+    name = re.sub(r"[^a-z0-9]+", " ", name)
+    return " ".join(word for word in name.split() if word != "the")
+
+
+class CountryResolver:
+    def __init__(self, path=ISO_CODE_FILE, aliases=ALIASES, cutoff=0.85, cache_path=None):
+        # keep_default_na: "NA" is the code of Namibia
+        table = pd.read_csv(path, keep_default_na=False, usecols=["Country", "alpha-2"])
+        table = table[table["alpha-2"] != ""]
+        self.index = dict(zip(table["Country"].map(normalize), table["alpha-2"]))
+        self.index.update((normalize(name), code) for name, code in aliases.items())
+        self._keys = list(self.index)
+        self.cutoff = cutoff
+        self.cache_path = cache_path
+        self.decisions = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.decisions = json.load(f)
+
+    def resolve(self, name):
+        """Alpha-2 code of a country name, None if it cannot be resolved"""
+        if name in self.decisions:
+            return self.decisions[name]
+        key = normalize(name)
+        code = self.index.get(key)
+        if code is None:
+            match = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.cutoff)
+            code = self.index[match[0]] if match else None
+        self.decisions[name] = code
+        return code
+
+    def codes(self, names):
+        """Alpha-2 codes of a sequence of names, each distinct name being resolved once"""
+        labels, uniques = pd.factorize(pd.Series(names, dtype=object))
+        codes = np.array([self.resolve(name) for name in uniques] + [None], dtype=object)
+        return codes[labels]
+
+    def save(self):
+        """Store the cached decisions, to be reviewed or reused by the next run"""
+        with open(self.cache_path, "w") as f:
+            json.dump(self.decisions, f, indent=1, sort_keys=True)
+
+    def join(self, left, right, left_on="Country", right_on="Country", how="inner"):
+        """Merge two DataFrames on the alpha-2 codes of their country columns"""
+        left = left.assign(**{"alpha-2": self.codes(left[left_on])})
+        right = right.assign(**{"alpha-2": self.codes(right[right_on])})
+        return pd.merge(left, right, on="alpha-2", how=how)
+
+
+def main():
+    resolver = CountryResolver()
+    names = ["Korea, South", "Taiwan*", "Burma", "Namibia", "Czechia", "Congo (Kinshasa)", "Cote d'Ivoire", "Holy Sea"]
+    for name, code in zip(names, resolver.codes(names)):
+        print(f"{name:20s} {code}")
+
+
+if __name__ == "__main__":
+    main()
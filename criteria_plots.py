@@ -0,0 +1,183 @@
+"""
+Small multiples of the Swiss criterion (14-day incidence per 100 000) for
+groups of countries.
+
+plot_swiss_criteria concatenates one DataFrame per country and creates a new
+figure for every group, and the last cell of the notebook creates about 19 of
+them for the countries ranked by incidence. Here the indicator is one aligned
+(country x date) matrix, and the groups are laid out as the panels of a single
+figure created once, rendered headless on an Agg canvas:
+
+    - the axes, ticks and grid are drawn and saved as a background, which is
+      only drawn again when the y limits of a panel change (every panel is
+      scaled to its own group, as the notebook plots were, unless ymax is
+      given) or when a page has fewer groups than panels, whose unused
+      panels are hidden;
+    - for every page of groups the background is restored and only the lines,
+      titles and legends, updated with the data of the groups, are drawn on
+      it (blitting), then the canvas buffer is written to a PNG file.
+
+    figure = CriteriaFigure(engine["incidence_14d"], engine.countries, engine.dates)
+    figure.render(REGIONS, "figures")
+    figure.render(groups_by_rank(engine["incidence_14d"], engine.countries), "figures", prefix="rank")
+"""
+
+import os
+
+import matplotlib
+import matplotlib.dates as mdates
+import matplotlib.image as mpimg
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from country_resolver import POPULATION_FALLBACK, CountryResolver
+from csse_matrix import CountryMatrix
+from csse_store import CONFIRMED_URL
+from indicators import IndicatorEngine
+from snapshot_cache import get_demographic_data
+
+REGIONS = {
+    "neighbours": [
+        "Switzerland", "Italy", "France", "Germany", "Austria", "Spain",
+        "Belgium", "Netherlands", "Portugal", "United Kingdom",
+    ],
+    "north_europe": ["Switzerland", "Sweden", "Denmark", "Norway", "Finland", "Iceland"],
+    "northern_europe": [
+        "Denmark", "Estonia", "Finland", "Iceland", "Ireland",
+        "Latvia", "Lithuania", "Norway", "Sweden", "United Kingdom",
+    ],
+    "eastern_europe": [
+        "Belarus", "Bulgaria", "Czechia", "Hungary", "Moldova",
+        "Poland", "Romania", "Russia", "Slovakia", "Ukraine",
+    ],
+    "southern_europe": [
+        "Albania", "Bosnia and Herzegovina", "Croatia", "Greece", "Italy", "Malta",
+        "Montenegro", "North Macedonia", "Portugal", "Serbia", "Slovenia", "Spain",
+    ],
+    "western_europe": ["Austria", "Belgium", "France", "Germany", "Liechtenstein", "Netherlands", "Switzerland"],
+    "north_africa": ["Algeria", "Egypt", "Libya", "Morocco", "Sudan", "Tunisia"],
+}
+
+
+def groups_by_rank(values, countries, size=10):
+    """Groups of size countries, ranked by their last value, as in the last cell of the notebook"""
+    last = pd.Series(np.asarray(values)[:, -1], index=countries).dropna()
+    ranked = list(last.sort_values(ascending=False).index)
+    return {f"rank {i + 1}-{min(i + size, len(ranked))}": ranked[i : i + size] for i in range(0, len(ranked), size)}
+
+
+class CriteriaFigure:
+    def __init__(self, values, countries, dates, rows=2, cols=2, n_lines=12, ymax=None, figsize=(16, 9), dpi=100):
+        self.values = np.asarray(values, dtype=float)
+        self.row = pd.Series(np.arange(len(countries)), index=countries)
+        self.x = mdates.date2num(pd.DatetimeIndex(dates).to_pydatetime())
+        self.ymax = ymax
+        self.cols = cols
+        # a figure on an Agg canvas, outside pyplot, so that nothing is shown
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self.axes = self.fig.subplots(rows, cols, sharex=True, squeeze=False).ravel()
+        colors = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+        self.lines = []
+        self.titles = []
+        for ax in self.axes:
+            ax.set_xlim(self.x[0], self.x[-1])
+            ax.set_ylim(0, 1.0 if ymax is None else ymax)
+            ax.grid(True)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %y"))
+            lines = [
+                ax.plot([], [], color=colors[i % len(colors)], ls="-" if i < len(colors) else "--", animated=True)[0]
+                for i in range(n_lines)
+            ]
+            self.lines.append(lines)
+            self.titles.append(ax.set_title("", animated=True))
+        self.fig.autofmt_xdate()
+        self._capture_background()
+
+    def _capture_background(self):
+        # the animated artists (lines, titles, legends) are left out of a full draw
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+    def _update(self, i, title, countries):
+        """Set the lines, title and legend of panel i, return True if its y limits changed"""
+        countries = [c for c in countries if c in self.row.index]
+        ax = self.axes[i]
+        self.titles[i].set_text(title)
+        for k, line in enumerate(self.lines[i]):
+            visible = k < len(countries)
+            if visible:
+                line.set_data(self.x, self.values[self.row[countries[k]]])
+                line.set_label(countries[k])
+            line.set_visible(visible)
+        # a legend sized for the countries of this group
+        visible = self.lines[i][: len(countries)]
+        ax.legend(visible, countries[: len(visible)], loc="upper left", fontsize="small").set_animated(True)
+        if self.ymax is not None:
+            return False
+        rows = self.row[countries[: len(visible)]].to_numpy()
+        top = np.nanmax(self.values[rows]) if len(rows) and not np.isnan(self.values[rows]).all() else 0.0
+        top = 1.05 * top if top > 0 else 1.0
+        if ax.get_ylim() == (0.0, top):
+            return False
+        ax.set_ylim(0.0, top)
+        return True
+
+    def _show_panels(self, n_panels):
+        """Show the first n_panels axes only, return True if that changed the layout"""
+        if sum(ax.get_visible() for ax in self.axes) == n_panels:
+            return False
+        # the panels left over on the last page are hidden, not left empty, and
+        # the dates go under the lowest panel of every column
+        for i, ax in enumerate(self.axes):
+            ax.set_visible(i < n_panels)
+            ax.tick_params(axis="x", labelbottom=i + self.cols >= n_panels, labelrotation=30)
+        return True
+
+    def _draw(self, n_panels):
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for i in range(n_panels):
+            ax = self.axes[i]
+            for artist in self.lines[i] + [self.titles[i], ax.get_legend()]:
+                if artist.get_visible():
+                    ax.draw_artist(artist)
+        return np.asarray(canvas.buffer_rgba())
+
+    def render(self, groups, directory, prefix="criteria"):
+        """Render the groups {title: countries}, len(axes) per page, return the PNG paths"""
+        os.makedirs(directory, exist_ok=True)
+        items = list(groups.items())
+        n = len(self.axes)
+        paths = []
+        for page, start in enumerate(range(0, len(items), n)):
+            chunk = items[start : start + n]
+            changed = [self._update(i, title, countries) for i, (title, countries) in enumerate(chunk)]
+            if self._show_panels(len(chunk)):
+                changed.append(True)
+            if any(changed):
+                self._capture_background()
+            path = os.path.join(directory, f"{prefix}_{page:02d}.png")
+            mpimg.imsave(path, self._draw(len(chunk)))
+            paths.append(path)
+        return paths
+
+
+def main():
+    data = CountryMatrix.from_wide({"cases": pd.read_csv(CONFIRMED_URL)})
+    df_population = get_demographic_data("https://www.worldometers.info/geography/countries-of-the-world/")
+    resolver = CountryResolver()
+    population = pd.Series(df_population["Population(2020)"].to_numpy(), index=resolver.codes(df_population["Country"]))
+    # unresolved names must not all share the None key
+    population = population[population.index.notna()].combine_first(pd.Series(POPULATION_FALLBACK))
+    population = population.reindex(resolver.codes(data.countries)).to_numpy(dtype=float)
+    engine = IndicatorEngine(data["cases"], population, data.dates, data.countries)
+    figure = CriteriaFigure(engine["incidence_14d"], engine.countries, engine.dates)
+    print(figure.render(REGIONS, "figures"))
+    print(figure.render(groups_by_rank(engine["incidence_14d"], engine.countries), "figures", prefix="rank"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+All the countries of the CSSE time series as one (country x date) matrix.
+
+The notebook builds the series of a country with extract_data, which filters
+the whole wide DataFrame, stacks it and parses its dates again for every
+country and every series. Here the wide files are reshaped in one pass: the
+date header is parsed once, the rows are grouped by country (or by country and
+province) once, and the provinces are summed with a single np.add.reduceat.
+Cases and deaths share the same countries and dates, so that
+
+    data = CountryMatrix.from_wide({"cases": df_cases, "deaths": df_deaths})
+    data["cases"]            # (country x date) matrix
+    data.frame("Italy")      # same layout as add(df_cases, df_deaths, "Italy")
+
+and the per-country series and frames are views of the matrix, not copies.
+"""
+
+import numpy as np
+import pandas as pd
+
+from csse_store import CONFIRMED_URL, DEATHS_URL, NON_DATE_COLUMNS, parse_dates
+
+COUNTRY = "Country/Region"
+PROVINCE = "Province/State"
+
+
+def _group(keys, matrix, by):
+    """Sum the rows of matrix by the columns `by` of keys, returning labels and sums"""
+    groups = keys.groupby(by, sort=True, dropna=False)
+    codes = groups.ngroup().to_numpy()
+    labels = groups.size().index
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    return labels, np.add.reduceat(matrix[order], starts, axis=0)
+
+
+class CountryMatrix:
+    def __init__(self, countries, dates, values, names=("cases", "deaths")):
+        """values has shape (len(names), len(countries), len(dates))"""
+        self.countries = pd.Index(countries)
+        self.dates = pd.DatetimeIndex(dates)
+        self.values = values
+        self.names = list(names)
+        self._row = pd.Series(np.arange(len(self.countries)), index=self.countries)
+
+    @classmethod
+    def _from_groups(cls, groups):
+        """Align {name: (labels, dates, matrix)} on the union of labels and dates"""
+        countries = groups[next(iter(groups))][0]
+        dates = groups[next(iter(groups))][1]
+        for labels, d, _ in groups.values():
+            if not countries.equals(labels):
+                countries = countries.union(labels)
+            if not dates.equals(d):
+                dates = dates.union(d)
+        values = np.full((len(groups), len(countries), len(dates)), np.nan)
+        for k, (labels, d, matrix) in enumerate(groups.values()):
+            values[k][np.ix_(countries.get_indexer(labels), dates.get_indexer(d))] = matrix
+        return cls(countries, dates, values, groups)
+
+    @classmethod
+    def from_wide(cls, frames, by=COUNTRY):
+        """Reshape {name: wide CSSE DataFrame}, grouped by country or [country, province]"""
+        groups = {}
+        for name, df in frames.items():
+            date_columns = [c for c in df.columns if c not in NON_DATE_COLUMNS]
+            matrix = df[date_columns].to_numpy(dtype=float)
+            labels, sums = _group(df, matrix, by)
+            groups[name] = (labels, parse_dates(date_columns), sums)
+        return cls._from_groups(groups)
+
+    @classmethod
+    def from_store(cls, store, names=("confirmed", "deaths"), by=COUNTRY):
+        """Build the matrix from the series of a CSSEStore"""
+        groups = {}
+        for name in names:
+            locations, dates, matrix = store.wide(name)
+            labels, sums = _group(locations, matrix.astype(float), by)
+            groups[name] = (labels, dates, sums)
+        return cls._from_groups(groups)
+
+    def __getitem__(self, name):
+        return self.values[self.names.index(name)]
+
+    def row(self, country):
+        return self._row[country]
+
+    def series(self, country, name="cases"):
+        """Series of one country, a view of the matrix"""
+        return pd.Series(self[name][self.row(country)], index=self.dates, name=country, copy=False)
+
+    def frame(self, country):
+        """DataFrame of all the series of one country, indexed by (date, day_of_year)"""
+        index = pd.MultiIndex.from_arrays([self.dates, self.dates.dayofyear], names=["date", "day_of_year"])
+        return pd.DataFrame(self.values[:, self.row(country), :].T, index=index, columns=self.names, copy=False)
+
+
+def main():
+    data = CountryMatrix.from_wide({"cases": pd.read_csv(CONFIRMED_URL), "deaths": pd.read_csv(DEATHS_URL)})
+    print(data["cases"].shape)
+    print(data.frame("Switzerland").tail())
+
+
+if __name__ == "__main__":
+    main()
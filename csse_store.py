@@ -0,0 +1,164 @@
+"""
+Local columnar store of the CSSE COVID-19 time series.
+
+The CSSE files (time_series_covid19_confirmed_global.csv, ..._deaths_global.csv)
+are wide: one row per location and one column per day, a new column being
+added every day. Instead of downloading and parsing the whole file on every
+run, the store keeps each series in long form, one record per (date,
+location), as three typed columns appended to raw binary files and read back
+as memory maps:
+
+    date      int32   days since 1970-01-01
+    location  int32   index in locations.csv (Province/State, Country/Region)
+    value     int64   cumulative count
+
+When a new snapshot is ingested only its header is parsed first; the rows are
+then read for the date columns which are not in the store yet, and appended.
+A snapshot can be a URL (the CSSE repository or a local HTTP stand-in) or a
+local file path, so the ingestion also runs offline.
+
+    store = CSSEStore("data/csse")
+    store.update("confirmed", CONFIRMED_URL)
+    df = store.load("confirmed")
+"""
+
+import io
+import json
+import os
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+CSSE_DIRECTORY = (
+    "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/"
+)
+CONFIRMED_URL = CSSE_DIRECTORY + "time_series_covid19_confirmed_global.csv"
+DEATHS_URL = CSSE_DIRECTORY + "time_series_covid19_deaths_global.csv"
+
+KEYS = ["Province/State", "Country/Region"]
+NON_DATE_COLUMNS = KEYS + ["Lat", "Long"]
+COLUMNS = {"date": np.int32, "location": np.int32, "value": np.int64}
+EPOCH = pd.Timestamp("1970-01-01")
+
+
+def parse_dates(header):
+    """Parse the CSSE date header (m/d/yy) once, returning a DatetimeIndex"""
+    return pd.to_datetime(pd.Index(header), format="%m/%d/%y")
+
+
+def _read_text(source):
+    if os.path.exists(source):
+        with open(source, encoding="utf-8") as f:
+            return f.read()
+    with urllib.request.urlopen(source) as response:
+        return response.read().decode("utf-8")
+
+
+class CSSEStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._locations_path = os.path.join(directory, "locations.csv")
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"series": {}}
+        if os.path.exists(self._locations_path):
+            self.locations = pd.read_csv(self._locations_path, keep_default_na=False, na_values=[""])
+        else:
+            self.locations = pd.DataFrame(columns=KEYS)
+
+    def _save_meta(self):
+        with open(self._meta_path, "w") as f:
+            json.dump(self.meta, f)
+        self.locations.to_csv(self._locations_path, index=False)
+
+    def _path(self, series, column):
+        return os.path.join(self.directory, f"{series}.{column}.bin")
+
+    def dates(self, series):
+        """Dates already stored for a series"""
+        days = self.meta["series"].get(series, [])
+        return EPOCH + pd.to_timedelta(days, unit="D")
+
+    def _location_ids(self, keys):
+        """Index of every (province, country) row, new locations being added"""
+        index = pd.MultiIndex.from_frame(self.locations[KEYS].astype(object))
+        keys = pd.MultiIndex.from_frame(keys[KEYS].astype(object))
+        ids = index.get_indexer(keys)
+        new = ids < 0
+        if new.any():
+            added = keys[new].unique()
+            self.locations = pd.concat(
+                [self.locations, pd.DataFrame(list(added), columns=KEYS)], ignore_index=True
+            )
+            ids[new] = len(index) + added.get_indexer(keys[new])
+        return ids.astype(np.int32)
+
+    def update(self, series, source):
+        """Append the dates of a snapshot which are not stored yet, return their number"""
+        text = _read_text(source)
+        header = pd.read_csv(io.StringIO(text), nrows=0).columns
+        date_columns = [c for c in header if c not in NON_DATE_COLUMNS]
+        days = ((parse_dates(date_columns) - EPOCH).days).astype(np.int32)
+        known = set(self.meta["series"].get(series, []))
+        new = [(column, day) for column, day in zip(date_columns, days) if day not in known]
+        if not new:
+            return 0
+        df = pd.read_csv(io.StringIO(text), usecols=KEYS + [column for column, _ in new])
+        location = self._location_ids(df)
+        values = df[[column for column, _ in new]].to_numpy(dtype=np.int64)
+        # long form, sorted by date then location
+        n_locations, n_dates = values.shape
+        columns = {
+            "date": np.repeat(np.array([day for _, day in new], dtype=np.int32), n_locations),
+            "location": np.tile(location, n_dates),
+            "value": values.T.ravel(),
+        }
+        for name, data in columns.items():
+            with open(self._path(series, name), "ab") as f:
+                f.write(data.astype(COLUMNS[name]).tobytes())
+        self.meta["series"][series] = sorted(known | {int(day) for _, day in new})
+        self._save_meta()
+        return len(new)
+
+    def columns(self, series):
+        """Memory-mapped (date, location, value) columns of a series"""
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            path = self._path(series, name)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return {n: np.empty(0, dtype=d) for n, d in COLUMNS.items()}
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r")
+        return arrays
+
+    def load(self, series):
+        """Long DataFrame (date, Province/State, Country/Region, value) of a series"""
+        columns = self.columns(series)
+        locations = self.locations.iloc[columns["location"]].reset_index(drop=True)
+        df = pd.DataFrame({"date": EPOCH + pd.to_timedelta(columns["date"], unit="D")})
+        df[KEYS] = locations[KEYS]
+        df["value"] = np.asarray(columns["value"])
+        return df
+
+    def wide(self, series):
+        """(location x date) matrix of a series, with its locations and dates"""
+        columns = self.columns(series)
+        days = np.array(self.meta["series"].get(series, []), dtype=np.int32)
+        matrix = np.zeros((len(self.locations), len(days)), dtype=np.int64)
+        matrix[columns["location"], np.searchsorted(days, columns["date"])] = columns["value"]
+        return self.locations, EPOCH + pd.to_timedelta(days, unit="D"), matrix
+
+
+def main():
+    store = CSSEStore("csse_data")
+    for series, url in (("confirmed", CONFIRMED_URL), ("deaths", DEATHS_URL)):
+        print(f"{series}: {store.update(series, url)} new dates")
+        print(store.load(series).tail())
+
+
+if __name__ == "__main__":
+    main()
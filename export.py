@@ -0,0 +1,71 @@
+"""
+Export of the result tables.
+
+The notebooks dump every intermediate DataFrame into one pd.ExcelWriter, and
+the openpyxl serialization is the slowest stage of the job. Here the tables
+are written as Parquet (pyarrow) and/or CSV files, one file per table and
+format, in parallel on a thread pool. An Excel workbook is only written when
+"xlsx" is among the formats, with openpyxl in write-only mode, which streams
+the rows to the file instead of building the whole workbook in memory.
+
+Intermediate stages (df1 ... df7 of Word Demography) are only exported when
+asked for by name, or all of them with include=True:
+
+    export({"world covid": df_merge}, "output", intermediate={"df1": df1, "df3": df3}, include=["df3"])
+"""
+
+import datetime
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+WRITERS = {
+    "parquet": lambda df, path: df.to_parquet(path, index=False),
+    "csv": lambda df, path: df.to_csv(path, index=False),
+}
+
+
+def write_excel(path, frames):
+    """Write {sheet name: DataFrame} to an .xlsx workbook, streaming the rows"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, df in frames.items():
+        sheet = workbook.create_sheet(str(name)[:31])
+        sheet.append([str(column) for column in df.columns])
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def export(frames, directory, formats=("parquet",), intermediate=None, include=(), prefix="", max_workers=None):
+    """Write the final tables and the requested intermediate ones, return the written paths"""
+    frames = dict(frames)
+    if intermediate:
+        frames.update((name, df) for name, df in intermediate.items() if include is True or name in include)
+    os.makedirs(directory, exist_ok=True)
+    tasks = {}
+    for fmt in formats:
+        if fmt == "xlsx":
+            path = os.path.join(directory, (prefix.rstrip("_") or "tables") + ".xlsx")
+            tasks[path] = functools.partial(write_excel, path, frames)
+            continue
+        for name, df in frames.items():
+            path = os.path.join(directory, f"{prefix}{name}.{fmt}".replace(" ", "_"))
+            tasks[path] = functools.partial(WRITERS[fmt], df, path)
+    with ThreadPoolExecutor(max_workers) as pool:
+        for future in [pool.submit(task) for task in tasks.values()]:
+            future.result()
+    return list(tasks)
+
+
+def main():
+    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    df = pd.DataFrame({"country": ["Switzerland", "Italy"], "population": [8654622, 60461826]})
+    print(export({"world covid": df}, "output", formats=("parquet", "csv", "xlsx"), prefix=f"covid19_{now}_"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Indicators of the Swiss quarantine criterion for all the countries at once.
+
+The notebook computes cases.diff(14) * 100000 / population country by
+country. Here the indicators are computed on the (country x date) matrix of
+cumulative cases, with one array operation for all the countries (or regions):
+
+    - incidence_14d: new cases over the last 14 days per 100 000 inhabitants;
+    - average_7d: mean daily new cases over the last 7 days;
+    - growth_ratio: new cases of the last 7 days over those of the 7 days before.
+
+The first days, which have no full window, are NaN as with DataFrame.diff.
+IndicatorEngine keeps the matrix and the indicators and, when the cases of a
+new day arrive, only computes the new column.
+"""
+
+import numpy as np
+import pandas as pd
+
+from csse_matrix import CountryMatrix
+from csse_store import CONFIRMED_URL
+
+WINDOW = 14
+WEEK = 7
+PER = 100000
+
+
+def lagged_difference(C, lag):
+    """C[:, t] - C[:, t - lag] along the dates, NaN for t < lag"""
+    out = np.full(C.shape, np.nan)
+    out[:, lag:] = C[:, lag:] - C[:, :-lag]
+    return out
+
+
+def _growth_ratio(last_week, previous_week):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous_week > 0, last_week / previous_week, np.nan)
+
+
+def indicators(C, population):
+    """Indicators of the cumulative cases C, shape (countries, dates)"""
+    C = np.asarray(C, dtype=float)
+    population = np.asarray(population, dtype=float)[:, np.newaxis]
+    week = lagged_difference(C, WEEK)
+    previous_week = np.full(C.shape, np.nan)
+    previous_week[:, WEEK:] = week[:, :-WEEK]
+    return {
+        "incidence_14d": lagged_difference(C, WINDOW) * PER / population,
+        "average_7d": week / WEEK,
+        "growth_ratio": _growth_ratio(week, previous_week),
+    }
+
+
+class IndicatorEngine:
+    def __init__(self, C, population, dates=None, countries=None):
+        C = np.asarray(C, dtype=float)
+        self.population = np.asarray(population, dtype=float)
+        self.countries = countries
+        self.dates = None if dates is None else pd.DatetimeIndex(dates)
+        self._n = C.shape[1]
+        # columns are preallocated and doubled when full, so appending a day is O(countries)
+        capacity = max(2 * self._n, WINDOW + 1)
+        self._C = np.empty((C.shape[0], capacity))
+        self._C[:, : self._n] = C
+        self._values = {}
+        for name, values in indicators(C, self.population).items():
+            self._values[name] = np.empty((C.shape[0], capacity))
+            self._values[name][:, : self._n] = values
+
+    def __getitem__(self, name):
+        if name == "cases":
+            return self._C[:, : self._n]
+        return self._values[name][:, : self._n]
+
+    def append(self, cases, date=None):
+        """Add the cumulative cases of a new day, shape (countries,), return its indicators"""
+        if self._n == self._C.shape[1]:
+            self._C = np.pad(self._C, ((0, 0), (0, self._C.shape[1])))
+            self._values = {
+                name: np.pad(values, ((0, 0), (0, values.shape[1]))) for name, values in self._values.items()
+            }
+        t = self._n
+        C = self._C
+        C[:, t] = cases
+        nan = np.full(C.shape[0], np.nan)
+        week = C[:, t] - C[:, t - WEEK] if t >= WEEK else nan
+        previous_week = C[:, t - WEEK] - C[:, t - 2 * WEEK] if t >= 2 * WEEK else nan
+        column = {
+            "incidence_14d": (C[:, t] - C[:, t - WINDOW]) * PER / self.population if t >= WINDOW else nan,
+            "average_7d": week / WEEK,
+            "growth_ratio": _growth_ratio(week, previous_week),
+        }
+        for name, values in column.items():
+            self._values[name][:, t] = values
+        self._n += 1
+        if self.dates is not None:
+            self.dates = self.dates.append(pd.DatetimeIndex([date]))
+        return column
+
+    def latest(self):
+        """Indicators of the last day, one row per country"""
+        last = {name: values[:, self._n - 1] for name, values in self._values.items()}
+        return pd.DataFrame(last, index=self.countries)
+
+    def frame(self, name):
+        """One indicator as a (date x country) DataFrame, ready to plot"""
+        return pd.DataFrame(self[name].T, index=self.dates, columns=self.countries)
+
+
+def main():
+    data = CountryMatrix.from_wide({"cases": pd.read_csv(CONFIRMED_URL)})
+    # population of a few countries, from the worldometers table of the notebook
+    population = pd.Series({"Switzerland": 8654622, "Italy": 60461826, "France": 65273511, "Germany": 83783942})
+    rows = data.countries.get_indexer(population.index)
+    engine = IndicatorEngine(data["cases"][rows, :-1], population, data.dates[:-1], population.index)
+    engine.append(data["cases"][rows, -1], data.dates[-1])
+    print(engine.latest())
+
+
+if __name__ == "__main__":
+    main()
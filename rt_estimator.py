@@ -0,0 +1,172 @@
+"""
+Effective reproduction number Rt of every country, with the method of Cori et
+al. (2013).
+
+With the daily incidence I_t and the serial interval distribution w_s, the
+total infectiousness is Lambda_t = sum_s I_{t-s} w_s and, assuming Rt constant
+over the tau days ending at t, the posterior of Rt for a Gamma(a, b) prior is
+
+    Gamma(shape = a + sum I, scale = 1 / (1 / b + sum Lambda))
+
+the sums running over the window. The convolutions of all the countries are
+computed at once along the dates, as a sum of shifted copies of the incidence
+over the few dozen days of the serial interval: unlike an FFT this is exact,
+so that Lambda is exactly 0 before an outbreak starts and those days are NaN
+rather than the prior mean. The credible intervals are gamma quantiles,
+without any sampling. RtEstimator updates all the estimates when the
+incidence of a new day arrives.
+
+The serial interval is either a discretized gamma distribution or the
+generation interval of the SEIR models of seir_model.py (an exponential latent
+period 1/sigma followed by an exponential infectious period 1/gamma), whose
+basic reproduction number is the printed beta / gamma.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from csse_matrix import CountryMatrix
+from csse_store import CONFIRMED_URL
+from smoothing import daily_increments
+
+
+def _discretize(cdf, n_max):
+    w = np.zeros(n_max + 1)
+    w[1:] = np.diff(cdf(np.arange(n_max + 1.0)))
+    return w / w.sum()
+
+
+def gamma_serial_interval(mean=4.7, sd=2.9, n_max=None):
+    """Serial interval w_s, s = 0..n_max (w_0 = 0), from a gamma distribution"""
+    shape = (mean / sd) ** 2
+    distribution = stats.gamma(shape, scale=mean / shape)
+    n_max = int(np.ceil(distribution.ppf(0.999))) if n_max is None else n_max
+    return _discretize(distribution.cdf, n_max)
+
+
+def seir_serial_interval(sigma, gamma, n_max=None):
+    """Generation interval of the SEIR model: latent period 1/sigma, then infectious period 1/gamma"""
+    if np.isclose(sigma, gamma):
+        distribution = stats.gamma(2, scale=1 / gamma)
+        cdf = distribution.cdf
+    else:
+
+        def cdf(t):
+            return 1 - (gamma * np.exp(-sigma * t) - sigma * np.exp(-gamma * t)) / (gamma - sigma)
+
+    if n_max is None:
+        n_max = int(np.ceil(7 * (1 / sigma + 1 / gamma)))
+    return _discretize(cdf, n_max)
+
+
+def infectiousness(I, w):
+    """Lambda_t = sum_{s >= 1} I_{t-s} w_s along the last axis"""
+    I = np.asarray(I, dtype=float)
+    L = np.zeros(I.shape)
+    for s in range(1, min(len(w), I.shape[-1])):
+        L[..., s:] += w[s] * I[..., :-s]
+    return L
+
+
+def _window_sum(X, window):
+    # shifted sums rather than differences of cumulative sums, which leave
+    # round-off residues where the window only holds zeros
+    out = X.copy()
+    for k in range(1, min(window, X.shape[-1])):
+        out[..., k:] += X[..., :-k]
+    return out
+
+
+def _posterior(sum_I, sum_L, valid, a, b, quantiles):
+    shape = a + sum_I
+    scale = 1 / (1 / b + sum_L)
+    with np.errstate(invalid="ignore"):
+        result = {"mean": shape * scale}
+        for q in quantiles:
+            result[f"q{q:g}"] = stats.gamma.ppf(q, shape, scale=scale)
+    for values in result.values():
+        values[~valid] = np.nan
+    return result
+
+
+def estimate_rt(I, w, window=7, a=1.0, b=5.0, quantiles=(0.025, 0.975)):
+    """Posterior mean and quantiles of Rt, shape (countries, dates), NaN before a full window"""
+    I = np.nan_to_num(np.asarray(I, dtype=float))
+    L = infectiousness(I, w)
+    sum_I = _window_sum(I, window)
+    sum_L = _window_sum(L, window)
+    valid = np.broadcast_to(np.arange(I.shape[-1]) >= window, I.shape) & (sum_L > 0)
+    return _posterior(sum_I, sum_L, valid, a, b, quantiles)
+
+
+class RtEstimator:
+    def __init__(self, I, w, window=7, a=1.0, b=5.0, quantiles=(0.025, 0.975)):
+        self.w = np.asarray(w, dtype=float)
+        self.window = window
+        self.a = a
+        self.b = b
+        self.quantiles = quantiles
+        I = np.nan_to_num(np.asarray(I, dtype=float))
+        self._n = I.shape[1]
+        # columns are preallocated and doubled when full, so appending a day is
+        # O(countries x serial interval)
+        capacity = max(2 * self._n, len(self.w), window)
+        self._I = np.zeros((I.shape[0], capacity))
+        self._I[:, : self._n] = I
+        self._L = np.zeros(self._I.shape)
+        self._L[:, : self._n] = infectiousness(I, self.w)
+        self._estimates = {}
+        for name, values in estimate_rt(I, self.w, window, a, b, quantiles).items():
+            self._estimates[name] = np.empty(self._I.shape)
+            self._estimates[name][:, : self._n] = values
+
+    @property
+    def I(self):
+        return self._I[:, : self._n]
+
+    @property
+    def L(self):
+        return self._L[:, : self._n]
+
+    @property
+    def estimates(self):
+        return {name: values[:, : self._n] for name, values in self._estimates.items()}
+
+    def append(self, incidence):
+        """Add the incidence of a new day, shape (countries,), return the estimates of that day"""
+        if self._n == self._I.shape[1]:
+            self._I = np.pad(self._I, ((0, 0), (0, self._I.shape[1])))
+            self._L = np.pad(self._L, ((0, 0), (0, self._L.shape[1])))
+            self._estimates = {
+                name: np.pad(values, ((0, 0), (0, values.shape[1]))) for name, values in self._estimates.items()
+            }
+        t = self._n
+        n_w = min(len(self.w) - 1, t)
+        # I_{t-1}, ..., I_{t-n_w} against w_1, ..., w_n_w
+        self._L[:, t] = self._I[:, t - n_w : t][:, ::-1] @ self.w[1 : n_w + 1]
+        self._I[:, t] = np.nan_to_num(np.asarray(incidence, dtype=float))
+        lo = max(t + 1 - self.window, 0)
+        sum_I = self._I[:, lo : t + 1].sum(axis=1)
+        sum_L = self._L[:, lo : t + 1].sum(axis=1)
+        valid = (t >= self.window) & (sum_L > 0)
+        day = _posterior(sum_I, sum_L, valid, self.a, self.b, self.quantiles)
+        for name, values in day.items():
+            self._estimates[name][:, t] = values
+        self._n += 1
+        return day
+
+
+def main():
+    data = CountryMatrix.from_wide({"cases": pd.read_csv(CONFIRMED_URL)})
+    I = daily_increments(data["cases"])
+    # generation interval of seir_model.py
+    beta, gamma, sigma = 0.3, 1 / 15, 1 / 7
+    print(f"R0 = beta / gamma = {beta / gamma:.2f}")
+    estimates = estimate_rt(I, seir_serial_interval(sigma, gamma))
+    rt = pd.DataFrame({name: values[:, -1] for name, values in estimates.items()}, index=data.countries)
+    print(rt.loc[["Switzerland", "Italy", "France", "Germany"]])
+
+
+if __name__ == "__main__":
+    main()
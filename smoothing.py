@@ -0,0 +1,94 @@
+"""
+Daily increments and smoothed daily series for all the countries at once.
+
+plot_daily expects the columns daily_cases, daily_cases_s, daily_death and
+daily_death_s. Here they are derived from the (country x date) matrices of
+cumulative counts in one pass:
+
+    - the daily increments are the differences along the dates, the first day
+      being NaN as with DataFrame.diff;
+    - reporting artefacts, negative increments produced by downward revisions
+      of the cumulative counts, are clipped to 0;
+    - the smoothing is a Savitzky-Golay filter (or a rolling mean) applied to
+      the whole matrix with a single convolution along the time axis.
+
+The Savitzky-Golay coefficients only depend on the window and the polynomial
+order, and are computed once per pair.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+from scipy.ndimage import convolve1d
+
+from csse_matrix import CountryMatrix
+from csse_store import CONFIRMED_URL, DEATHS_URL
+
+
+@functools.lru_cache(maxsize=None)
+def savgol_coefficients(window, polyorder):
+    coeffs = signal.savgol_coeffs(window, polyorder)
+    coeffs.setflags(write=False)
+    return coeffs
+
+
+def daily_increments(C, clip=True):
+    """Daily increments of cumulative counts C along the last axis, negatives clipped to 0"""
+    C = np.asarray(C, dtype=float)
+    daily = np.full(C.shape, np.nan)
+    daily[..., 1:] = np.diff(C, axis=-1)
+    if clip:
+        np.maximum(daily, 0.0, out=daily, where=~np.isnan(daily))
+    return daily
+
+
+def savgol(X, window=7, polyorder=2, mode="nearest"):
+    """Savitzky-Golay smoothing of every row of X along the last axis"""
+    X = np.nan_to_num(np.asarray(X, dtype=float))
+    return convolve1d(X, savgol_coefficients(window, polyorder), axis=-1, mode=mode)
+
+
+def rolling_mean(X, window=7):
+    """Trailing mean over window days along the last axis, NaN for incomplete windows"""
+    X = np.nan_to_num(np.asarray(X, dtype=float))
+    S = np.cumsum(X, axis=-1)
+    out = np.full(X.shape, np.nan)
+    out[..., window - 1] = S[..., window - 1]
+    out[..., window:] = S[..., window:] - S[..., :-window]
+    return out / window
+
+
+def daily_series(data, cases="cases", deaths="deaths", method="savgol", window=7, polyorder=2):
+    """The daily columns of plot_daily, as (country x date) matrices"""
+    result = {}
+    for name, label in ((cases, "daily_cases"), (deaths, "daily_death")):
+        daily = daily_increments(data[name])
+        if method == "savgol":
+            smooth = np.maximum(savgol(daily, window, polyorder), 0.0)
+        else:
+            smooth = rolling_mean(daily, window)
+        result[label] = daily
+        result[label + "_s"] = smooth
+    return result
+
+
+def country_frame(data, daily, country):
+    """DataFrame of one country with the columns used by plot_daily"""
+    df = data.frame(country).copy()
+    row = data.row(country)
+    for label, values in daily.items():
+        df[label] = values[row]
+    df.country = country
+    return df
+
+
+def main():
+    data = CountryMatrix.from_wide({"cases": pd.read_csv(CONFIRMED_URL), "deaths": pd.read_csv(DEATHS_URL)})
+    daily = daily_series(data)
+    print(country_frame(data, daily, "Switzerland").tail(10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Local snapshots of the tables scraped from web pages.
+
+get_demographic_data downloads and parses a whole worldometers page on every
+run. Here the parsed table is stored on disk, with the time it was fetched and
+the ETag / Last-Modified headers of the response:
+
+    - within the freshness window (max_age) the table is served from disk;
+    - past it, the page is requested again with If-None-Match /
+      If-Modified-Since, and a 304 Not Modified response only renews the
+      timestamp, without parsing anything;
+    - if that request fails, the stale snapshot is served with a warning;
+    - offline (offline=True, or the environment variable SNAPSHOT_OFFLINE=1),
+      the stored snapshots are served whatever their age and a missing one is
+      an error. A directory of snapshots can therefore be used as fixtures by
+      tests and batch jobs.
+
+Tables are stored as Parquet files, which load under any pandas version and,
+unlike pickles, cannot execute code when read from a fixture directory.
+Parquet needs string column names, so the column levels of a MultiIndex are
+joined with spaces, in the returned table as in the stored one.
+
+    cache = SnapshotCache("snapshots", max_age=24 * 3600)
+    df_population = get_demographic_data(url2, cache)
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+import requests
+
+
+def _columnar(df):
+    """df with string column names, as stored in Parquet"""
+    if isinstance(df.columns, pd.MultiIndex):
+        columns = [
+            " ".join(str(level) for level in column if not str(level).startswith("Unnamed")) for column in df.columns
+        ]
+    else:
+        columns = [str(column) for column in df.columns]
+    return df.set_axis(columns, axis=1)
+
+
+def _key(url, table, read_html_kwargs):
+    text = json.dumps([url, table, read_html_kwargs], sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class SnapshotCache:
+    def __init__(self, directory="snapshots", max_age=24 * 3600.0, offline=None, timeout=30.0):
+        self.directory = directory
+        self.max_age = max_age
+        if offline is None:
+            offline = os.environ.get("SNAPSHOT_OFFLINE", "") not in ("", "0")
+        self.offline = offline
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".parquet"
+
+    def meta(self, url, table=0, **read_html_kwargs):
+        """Stored metadata of a snapshot (url, fetched_at, etag, last_modified), None if missing"""
+        meta_path, _ = self._paths(_key(url, table, read_html_kwargs))
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def put(self, url, df, etag=None, last_modified=None, fetched_at=None, table=0, **read_html_kwargs):
+        """Store a table as the snapshot of url"""
+        meta_path, table_path = self._paths(_key(url, table, read_html_kwargs))
+        _columnar(df).to_parquet(table_path + ".tmp")
+        os.replace(table_path + ".tmp", table_path)
+        meta = {
+            "url": url,
+            "table": table,
+            "read_html": read_html_kwargs,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=1)
+
+    def get(self, url, table=0, **read_html_kwargs):
+        """Table number `table` of the page at url, served from disk when fresh enough"""
+        meta_path, table_path = self._paths(_key(url, table, read_html_kwargs))
+        meta = self.meta(url, table, **read_html_kwargs)
+        if meta is not None and (self.offline or time.time() - meta["fetched_at"] <= self.max_age):
+            return pd.read_parquet(table_path)
+        if self.offline:
+            raise FileNotFoundError(f"No snapshot of {url} in {self.directory}")
+
+        headers = {}
+        if meta is not None:
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            res = requests.get(url, headers=headers, timeout=self.timeout)
+            if res.status_code not in (200, 304) or (res.status_code == 304 and meta is None):
+                raise Exception("Can't dowload data")
+        except Exception as error:
+            if meta is None:
+                raise
+            warnings.warn(f"Serving the stale snapshot of {url}: {error}")
+            return pd.read_parquet(table_path)
+        if res.status_code == 304:
+            meta["fetched_at"] = time.time()
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=1)
+            return pd.read_parquet(table_path)
+        df = _columnar(pd.read_html(io.StringIO(res.text), **read_html_kwargs)[table])
+        self.put(url, df, res.headers.get("ETag"), res.headers.get("Last-Modified"), table=table, **read_html_kwargs)
+        return df
+
+
+def get_demographic_data(url, cache=None, **read_html_kwargs):
+    """First table of the page at url, without the "#" column, through a snapshot cache"""
+    cache = SnapshotCache() if cache is None else cache
+    df = cache.get(url, **read_html_kwargs)
+    if "#" in df.columns:
+        df = df.drop(columns="#")
+    return df
+
+
+def main():
+    cache = SnapshotCache()
+    df = get_demographic_data("https://www.worldometers.info/geography/countries-of-the-world/", cache)
+    print(df.head())
+    print(cache.meta("https://www.worldometers.info/geography/countries-of-the-world/"))
+
+
+if __name__ == "__main__":
+    main()